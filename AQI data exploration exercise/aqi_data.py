@@ -0,0 +1,178 @@
+# aqi_data.py
+
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = '%m/%d/%Y %H:%M:%S'
+LOCATION_COLUMNS = ['City', 'State', 'Country']
+MEASUREMENT_COLUMNS = ['AQI (US)', 'Temperature (°C)', 'Pressure (hPa)', 'Humidity (%)', 'Wind Speed (m/s)']
+# Dates and locations are read with a fixed dtype. Measurements are left to
+# pandas, which reads clean columns as floats in C; a stray non-numeric cell
+# such as '-' turns its column into strings, and parse_readings coerces it.
+CSV_DTYPES = {'Date': 'string', 'Time': 'string', **{col: 'category' for col in LOCATION_COLUMNS}}
+CACHE_VERSION = 1
+
+# A day and a half of readings, for trying the pipeline without an export.
+SAMPLE_CSV = """Date,Time,City,State,Country,AQI (US),Temperature (°C),Pressure (hPa),Humidity (%),Wind Speed (m/s)
+08/01/2023,17:14:28,New York City,New York,USA,16,25,1019,42,6.26
+08/01/2023,17:15:29,New York City,New York,USA,16,25,1019,42,6.26
+08/01/2023,19:14:56,New York City,New York,USA,16,25,1020,45,6.26
+08/01/2023,21:15:27,New York City,New York,USA,16,22,1021,51,4.02
+08/01/2023,22:26:21,New York City,New York,USA,16,22,1021,52,4.02
+08/01/2023,23:15:22,New York City,New York,USA,16,21,1022,51,4.47
+08/02/2023,00:17:50,New York City,New York,USA,16,20,1022,51,4.12
+08/02/2023,01:13:53,New York City,New York,USA,12,20,1022,52,4.47
+08/02/2023,02:19:35,New York City,New York,USA,12,19,1022,54,3.6
+08/02/2023,03:13:55,New York City,New York,USA,12,18,1021,59,2.68
+08/02/2023,04:18:45,New York City,New York,USA,12,18,1022,60,4.63
+08/02/2023,05:14:44,New York City,New York,USA,12,18,1022,59,3.6
+08/02/2023,06:15:56,New York City,New York,USA,8,17,1022,62,3.58
+08/02/2023,07:12:21,New York City,New York,USA,12,18,1023,64,4.02
+08/02/2023,08:31:48,New York City,New York,USA,12,19,1024,58,3.6
+08/02/2023,09:18:45,New York City,New York,USA,12,21,1024,51,4.47
+08/02/2023,10:14:09,New York City,New York,USA,12,22,1024,44,4.92
+08/02/2023,11:14:46,New York City,New York,USA,12,23,1024,42,5.14
+08/02/2023,12:20:12,New York City,New York,USA,12,24,1023,40,4.63
+08/02/2023,13:13:01,New York City,New York,USA,12,25,1023,39,3.13
+08/02/2023,14:18:43,New York City,New York,USA,12,25,1023,39,1.54
+08/02/2023,15:11:51,New York City,New York,USA,16,26,1022,39,5.66
+08/02/2023,16:15:28,New York City,New York,USA,16,26,1021,41,4.92
+08/02/2023,17:12:47,New York City,New York,USA,16,25,1021,43,3.6
+08/02/2023,18:13:43,New York City,New York,USA,16,25,1022,44,4.63
+08/02/2023,19:14:26,New York City,New York,USA,16,23,1021,51,6.71
+08/02/2023,21:16:50,New York City,New York,USA,16,21,1022,58,4.92
+08/02/2023,22:28:18,New York City,New York,USA,16,21,1022,59,4.92
+08/02/2023,23:15:23,New York City,New York,USA,12,20,1022,61,5.14
+08/03/2023,00:17:56,New York City,New York,USA,12,20,1023,62,4.12
+"""
+
+
+def parse_readings(df):
+    """Turn the raw Date/Time strings into one Timestamp column, parsed once and vectorized.
+
+    Measurements become float32, with cells that are not numbers as NaN.
+    """
+    df['Timestamp'] = pd.to_datetime(df['Date'] + ' ' + df['Time'], format=DATE_FORMAT, errors='coerce')
+    df = df.drop(columns=['Date', 'Time']).dropna(subset=['Timestamp'])
+    for col in MEASUREMENT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    return df[['Timestamp'] + [col for col in df.columns if col != 'Timestamp']].reset_index(drop=True)
+
+
+def read_readings(source):
+    """Read an export (a path or a file object)."""
+    return parse_readings(pd.read_csv(source, dtype=CSV_DTYPES))
+
+
+def iter_readings(source, chunksize=100_000):
+    """Yield an export in parsed chunks of `chunksize` rows, without holding all of it in memory."""
+    with pd.read_csv(source, dtype=CSV_DTYPES, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield parse_readings(chunk)
+
+
+def load_sample():
+    return read_readings(io.StringIO(SAMPLE_CSV))
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_file_hash(path, stat_path):
+    """file_hash(path), read back from `stat_path` while the file's size and modification time are unchanged."""
+    stat = os.stat(path)
+    try:
+        with open(stat_path, encoding='utf-8') as f:
+            stored = json.load(f)
+        if (stored['size'], stored['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return stored['hash']
+    except (OSError, ValueError, KeyError):
+        pass
+    digest = file_hash(path)
+    tmp_path = f'{stat_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}, f)
+    os.replace(tmp_path, stat_path)
+    return digest
+
+
+def default_cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '.aqi_cache')
+
+
+def save_columns(df, directory):
+    """Store each column as a .npy file; categoricals as integer codes plus their labels."""
+    tmp_dir = f'{directory}.{os.getpid()}.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    meta = {'version': CACHE_VERSION, 'columns': []}
+    for number, col in enumerate(df.columns):
+        values = df[col]
+        entry = {'name': col, 'file': f'{number}.npy'}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            entry['categories'] = [str(label) for label in values.cat.categories]
+            values = values.cat.codes
+        np.save(os.path.join(tmp_dir, entry['file']), values.to_numpy())
+        meta['columns'].append(entry)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        # Another process cached the same file first; its copy is just as good.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_columns(directory):
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    columns = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(values, categories=entry['categories'])
+        columns[entry['name']] = values
+    return pd.DataFrame(columns)
+
+
+def load_readings(path, cache_dir=None, use_cache=True):
+    """Load an export, reusing the columnar cache when the file's content has not changed.
+
+    Cache entries live in `cache_dir` (default: .aqi_cache next to the CSV)
+    and are keyed by a hash of the file, so an edited or re-exported CSV is
+    parsed again and older entries for it are removed. The hash is stored
+    with the file's size and modification time, and the file is only read
+    to hash it again when one of those has changed.
+    """
+    if not use_cache:
+        return read_readings(path)
+    cache_dir = cache_dir or default_cache_dir(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = stat_file_hash(path, os.path.join(cache_dir, f'{stem}.stat.json'))
+    directory = os.path.join(cache_dir, f'{stem}-{digest}')
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        df = load_columns(directory)
+        if df is not None:
+            return df
+        shutil.rmtree(directory, ignore_errors=True)
+
+    df = read_readings(path)
+    for name in os.listdir(cache_dir):
+        if name.rsplit('-', 1)[0] == stem and not name.endswith(('.tmp', '.stat.json')):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    save_columns(df, directory)
+    return df
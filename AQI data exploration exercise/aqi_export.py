@@ -0,0 +1,198 @@
+# aqi_export.py
+
+import argparse
+import re
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from aqi_data import LOCATION_COLUMNS, MEASUREMENT_COLUMNS
+from aqi_features import LAG_FEATURES, LOOKBACK, lag_features
+from aqi_pipeline import AQI_TARGET, TIME_FEATURES, add_time_features, forecast, load_data, load_model
+
+# Metabase's SQLite driver takes the column type from the declared type name,
+# so time columns are declared DATETIME/DATE and hold ISO-formatted text.
+SQL_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+ROLLUPS = {'readings_hourly': ('hour', '%Y-%m-%d %H:00:00', 'DATETIME'),
+           'readings_daily': ('day', '%Y-%m-%d', 'DATE')}
+
+
+def column_name(label):
+    """'AQI (US)' -> 'aqi_us', 'DayOfWeek' -> 'day_of_week'."""
+    label = re.sub(r'(?<=[a-z])(?=[A-Z])', '_', label)
+    return re.sub(r'[^0-9a-z]+', '_', label.lower()).strip('_')
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    # WAL lets Metabase keep reading while an export is written.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def ensure_table(conn, table, key, columns):
+    """Create `table` keyed by `key`, or add the `columns` ({name: type}) it does not have yet."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if not existing:
+        definitions = ', '.join(f'{name} {kind}' for name, kind in columns.items())
+        conn.execute(f'CREATE TABLE {table} ({definitions}, PRIMARY KEY ({", ".join(key)})) WITHOUT ROWID')
+    for name, kind in columns.items():
+        if existing and name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {kind}')
+
+
+def upsert(conn, table, key, frame, batch_size=50_000):
+    """Insert the rows of `frame` (columns named as in the table), replacing rows with the same key.
+
+    Rows are sent with executemany `batch_size` at a time, so only one
+    batch of Python tuples exists at once. SQLite stores NaN as NULL.
+    """
+    columns = list(frame.columns)
+    updates = ', '.join(f'{col}=excluded.{col}' for col in columns if col not in key)
+    sql = (f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+           f'ON CONFLICT ({", ".join(key)}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING'))
+    for start in range(0, len(frame), batch_size):
+        conn.executemany(sql, frame.iloc[start:start + batch_size].itertuples(index=False, name=None))
+    return len(frame)
+
+
+def sql_times(timestamps, fmt=SQL_TIME_FORMAT):
+    return timestamps.dt.strftime(fmt)
+
+
+def measurement_columns(df):
+    return [col for col in MEASUREMENT_COLUMNS if col in df.columns]
+
+
+def ensure_schema(conn, df):
+    measurements = {column_name(col): 'REAL' for col in measurement_columns(df)}
+    ensure_table(conn, 'readings', ['city', 'timestamp'],
+                 {'city': 'TEXT', 'timestamp': 'DATETIME', **{column_name(col): 'TEXT' for col in LOCATION_COLUMNS
+                                                              if col != 'City'}, **measurements})
+    ensure_table(conn, 'reading_features', ['city', 'timestamp'],
+                 {'city': 'TEXT', 'timestamp': 'DATETIME',
+                  **{column_name(col): 'INTEGER' for col in TIME_FEATURES},
+                  **{column_name(col): 'REAL' for col in LAG_FEATURES}})
+    aggregates = {'readings': 'INTEGER', **{f'{col}_mean': 'REAL' for col in measurements}}
+    aqi = column_name(AQI_TARGET)
+    if aqi in measurements:
+        aggregates.update({f'{aqi}_min': 'REAL', f'{aqi}_max': 'REAL'})
+    for table, (bucket, _, kind) in ROLLUPS.items():
+        ensure_table(conn, table, ['city', bucket], {'city': 'TEXT', bucket: kind, **aggregates})
+    # Dashboards filter on time across all cities; the keys already cover per-city ranges.
+    conn.execute('CREATE INDEX IF NOT EXISTS readings_by_time ON readings (timestamp)')
+    for table, (bucket, _, _) in ROLLUPS.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_by_{bucket} ON {table} ({bucket})')
+
+
+def latest_timestamps(conn):
+    """The newest stored reading of every city, as Timestamps."""
+    rows = conn.execute('SELECT city, MAX(timestamp) FROM readings GROUP BY city').fetchall()
+    return {city: pd.Timestamp(latest) for city, latest in rows}
+
+
+def refresh_rollups(conn, spans):
+    """Recompute the hourly and daily rollups of every city over its (first, last) span of changed readings.
+
+    Whole days are recomputed, from the readings table through its
+    (city, timestamp) key, so the cost depends on the changed days only.
+    """
+    measurements = [row[1] for row in conn.execute('PRAGMA table_info(readings)')
+                    if row[2] == 'REAL']
+    aqi = column_name(AQI_TARGET)
+    aggregates = ['COUNT(*)'] + [f'AVG({col})' for col in measurements]
+    names = ['readings'] + [f'{col}_mean' for col in measurements]
+    if aqi in measurements:
+        aggregates += [f'MIN({aqi})', f'MAX({aqi})']
+        names += [f'{aqi}_min', f'{aqi}_max']
+    for table, (bucket, fmt, _) in ROLLUPS.items():
+        sql = (f'INSERT OR REPLACE INTO {table} (city, {bucket}, {", ".join(names)}) '
+               f"SELECT city, strftime('{fmt}', timestamp) AS bucket, {', '.join(aggregates)} FROM readings "
+               f'WHERE city = ? AND timestamp >= ? AND timestamp < ? GROUP BY city, bucket')
+        conn.executemany(sql, [(city, first.normalize().strftime(SQL_TIME_FORMAT),
+                                (last.normalize() + pd.Timedelta(days=1)).strftime(SQL_TIME_FORMAT))
+                               for city, (first, last) in spans.items()])
+
+
+def readings_values(column):
+    # Measurements are loaded as float32; rounding keeps 6.26 from being stored as 6.260000228881836.
+    return column.astype('float64').round(4)
+
+
+def export_readings(conn, df, full=False, batch_size=50_000):
+    """Upsert readings, their time and lag features, and the rollups over them; returns the rows written.
+
+    Unless `full`, only readings newer than the latest stored one of their
+    city are written. Their lag features still see the LOOKBACK of older
+    readings before them, which is all that is computed.
+    """
+    df = df.assign(City=df['City'].astype(str))
+    ensure_schema(conn, df)
+    if full:
+        featured = add_time_features(lag_features(df))
+    else:
+        # NaT for cities the database has no readings of yet.
+        latest = pd.to_datetime(df['City'].map(latest_timestamps(conn)))
+        context = df[latest.isna() | (df['Timestamp'] > latest - LOOKBACK)]
+        featured = add_time_features(lag_features(context))
+        newest = latest[context.index]
+        featured = featured[newest.isna() | (featured['Timestamp'] > newest)]
+    if featured.empty:
+        return 0
+
+    keys = pd.DataFrame({'city': featured['City'], 'timestamp': sql_times(featured['Timestamp'])})
+    readings = keys.assign(**{column_name(col): featured[col].astype(str) for col in LOCATION_COLUMNS
+                              if col != 'City' and col in featured},
+                           **{column_name(col): readings_values(featured[col])
+                              for col in measurement_columns(featured)})
+    features = keys.assign(**{column_name(col): featured[col] for col in TIME_FEATURES},
+                           **{column_name(col): featured[col] for col in LAG_FEATURES})
+    spans = featured.groupby('City')['Timestamp'].agg(['min', 'max'])
+    with conn:
+        upsert(conn, 'readings', ['city', 'timestamp'], readings, batch_size)
+        upsert(conn, 'reading_features', ['city', 'timestamp'], features, batch_size)
+        refresh_rollups(conn, {city: (row['min'], row['max']) for city, row in spans.iterrows()})
+    return len(featured)
+
+
+def export_forecast(conn, forecast_df, generated_at=None, batch_size=50_000):
+    """Upsert a forecast table (see aqi_pipeline.forecast), keyed by city and forecast date."""
+    table = forecast_df.rename(columns=column_name).assign(
+        generated_at=generated_at or datetime.now().strftime(SQL_TIME_FORMAT))
+    ensure_table(conn, 'forecasts', ['city', 'forecast_date'],
+                 {'city': 'TEXT', 'forecast_date': 'DATE', 'generated_at': 'DATETIME',
+                  **{col: 'REAL' for col in table.columns
+                     if col not in ('city', 'forecast_date', 'generated_at')}})
+    with conn:
+        return upsert(conn, 'forecasts', ['city', 'forecast_date'], table, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export AQI readings, features, rollups and forecasts to SQLite "
+                                                 "for Metabase.")
+    parser.add_argument('--data', default='data_export_June05_2025.csv', help="'sample' or a CSV export")
+    parser.add_argument('--database', default='aqi.db', help="SQLite database to create or update")
+    parser.add_argument('--model', help="also export a forecast for every city made with this saved model")
+    parser.add_argument('--horizon', type=int, default=5, help="days to forecast with --model")
+    parser.add_argument('--full', action='store_true',
+                        help="write every reading again, not just the ones newer than the database's")
+    parser.add_argument('--batch-size', type=int, default=50_000, help="rows sent to SQLite per executemany call")
+    parser.add_argument('--no-cache', action='store_true', help="always parse the CSV instead of using .aqi_cache")
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data, use_cache=not args.no_cache)
+    conn = connect(args.database)
+    try:
+        written = export_readings(conn, df, full=args.full, batch_size=args.batch_size)
+        print(f"Wrote {written} readings to '{args.database}'.")
+        if args.model:
+            forecast_df = forecast(load_model(args.model), df, horizon=args.horizon, cities='all')
+            print(f"Wrote {export_forecast(conn, forecast_df, batch_size=args.batch_size)} forecast rows.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
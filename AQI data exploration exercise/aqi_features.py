@@ -0,0 +1,69 @@
+# aqi_features.py
+
+import numpy as np
+import pandas as pd
+
+AQI = 'AQI (US)'
+PRESSURE = 'Pressure (hPa)'
+# Rolling AQI means over the readings before each one, per city.
+ROLLING_WINDOWS = ('1h', '6h', '24h')
+# merge_asof lookups: (feature, column, how far back, how much older than that a reading may be).
+AS_OF_LOOKUPS = (
+    ('AQI 24h ago', AQI, pd.Timedelta(hours=24), pd.Timedelta(hours=2)),
+    ('Pressure 3h ago', PRESSURE, pd.Timedelta(hours=3), pd.Timedelta(hours=1)),
+)
+LAG_FEATURES = [f'AQI mean {window}' for window in ROLLING_WINDOWS] + ['AQI max 24h', 'AQI 24h ago',
+                                                                      'Pressure trend 3h']
+# How far back the features look, i.e. how much history a reading needs before it.
+LOOKBACK = pd.Timedelta(hours=26)
+
+
+def lag_features(df):
+    """Add per-city lag and rolling-window features over the (irregular) timestamps.
+
+    Rolling windows are time based and exclude the reading itself
+    (closed='left'), so no feature sees the AQI it is used to predict.
+    Readings far enough back for the lookups are found with merge_asof,
+    and stay NaN when there is none close enough. Everything is computed
+    by sorted, grouped pandas operations, so the cost is linear in the
+    number of rows (plus one sort).
+    """
+    order = np.lexsort((df['Timestamp'].to_numpy(), df['City'].astype(str).to_numpy()))
+    data = df.iloc[order][['City', 'Timestamp', AQI, PRESSURE]].reset_index(drop=True)
+    data['City'] = data['City'].astype(str)
+    features = pd.DataFrame(index=data.index)
+
+    grouped = data.groupby('City', sort=False)
+    for window in ROLLING_WINDOWS:
+        rolling = grouped.rolling(window, on='Timestamp', closed='left')[AQI]
+        features[f'AQI mean {window}'] = rolling.mean().to_numpy()
+    features['AQI max 24h'] = grouped.rolling('24h', on='Timestamp', closed='left')[AQI].max().to_numpy()
+
+    by_time = data.reset_index().sort_values('Timestamp', kind='stable')
+    for name, column, back, tolerance in AS_OF_LOOKUPS:
+        wanted = by_time[['index', 'City', 'Timestamp']].assign(Timestamp=by_time['Timestamp'] - back)
+        found = pd.merge_asof(wanted, by_time[['City', 'Timestamp', column]], on='Timestamp', by='City',
+                              tolerance=tolerance, allow_exact_matches=True)
+        features.loc[found['index'].to_numpy(), name] = found[column].to_numpy()
+    features['Pressure trend 3h'] = data[PRESSURE] - features.pop('Pressure 3h ago')
+
+    # Back to the caller's row order.
+    result = df.copy()
+    result[LAG_FEATURES] = features[LAG_FEATURES].to_numpy()[np.argsort(order)]
+    return result
+
+
+def time_splits(timestamps, n_splits=5, test_size=0.2):
+    """Time-ordered backtesting folds as (train positions, test positions).
+
+    The last `test_size` of the time range is cut into `n_splits` equal
+    periods. Each fold tests on one period and trains on everything
+    before it, so no fold trains on readings from after its test period.
+    """
+    times = pd.Series(timestamps).reset_index(drop=True)
+    start, end = times.min(), times.max()
+    first_test = end - (end - start) * test_size
+    bounds = pd.date_range(first_test, end, periods=n_splits + 1)
+    for fold, (test_start, test_end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        in_test = (times >= test_start) & ((times < test_end) if fold < n_splits - 1 else (times <= test_end))
+        yield np.flatnonzero(times < test_start), np.flatnonzero(in_test)
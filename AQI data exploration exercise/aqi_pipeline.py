@@ -0,0 +1,489 @@
+# aqi_pipeline.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from aqi_features import LAG_FEATURES, LOOKBACK, lag_features, time_splits
+from aqi_data import LOCATION_COLUMNS, MEASUREMENT_COLUMNS, iter_readings, load_readings, load_sample
+
+TARGETS = ['AQI (US)', 'Temperature (°C)']
+AQI_TARGET = 'AQI (US)'
+TIME_FEATURES = ['Hour', 'DayOfWeek', 'Month', 'DayOfYear']
+# The group of per-city models whose forest covers every city, for cities without training rows of their own.
+POOLED = 'all cities'
+
+
+def load_data(source, cache_dir=None, use_cache=True):
+    """Load the built-in sample ('sample') or a CSV export."""
+    if source == 'sample':
+        return load_sample()
+    return load_readings(source, cache_dir=cache_dir, use_cache=use_cache)
+
+
+def add_time_features(df):
+    timestamps = df['Timestamp'].dt
+    return df.assign(Hour=timestamps.hour, DayOfWeek=timestamps.dayofweek, Month=timestamps.month,
+                     DayOfYear=timestamps.dayofyear)
+
+
+def weather_features(targets):
+    return [col for col in MEASUREMENT_COLUMNS if col not in targets]
+
+
+def training_frame(df, targets=TARGETS, lags=False):
+    """Features and targets for every reading that has all target values.
+
+    With `lags`, per-city lag and rolling features (see aqi_features) are
+    added, computed before readings without targets are dropped.
+    """
+    data = add_time_features(lag_features(df) if lags else df)
+    data = data.dropna(subset=targets)
+    return data.drop(columns=targets), data[targets]
+
+
+def climatology(history):
+    """Average readings per city and day of the year, from a single groupby."""
+    columns = [col for col in MEASUREMENT_COLUMNS if col in history.columns]
+    day_of_year = history['Timestamp'].dt.dayofyear.rename('DayOfYear')
+    grouped = history.groupby([history['City'].astype(str), day_of_year])
+    return grouped[columns].mean().assign(Readings=grouped.size()).reset_index()
+
+
+def merge_climatology(old, new):
+    """Combine two climatology tables, weighting each average by its number of readings."""
+    combined = pd.concat([old, new], ignore_index=True)
+    columns = [col for col in combined.columns if col not in ('City', 'DayOfYear', 'Readings')]
+    weighted = combined[columns].mul(combined['Readings'], axis=0).assign(
+        City=combined['City'], DayOfYear=combined['DayOfYear'], Readings=combined['Readings'])
+    totals = weighted.groupby(['City', 'DayOfYear']).sum()
+    return totals[columns].div(totals['Readings'], axis=0).assign(Readings=totals['Readings']).reset_index()
+
+
+def locations(history):
+    """State and Country of every city, the city with most readings first."""
+    places = history[LOCATION_COLUMNS].astype(str)
+    counts = places['City'].value_counts()
+    places = places.drop_duplicates('City').set_index('City').loc[counts.index]
+    return places.reset_index()
+
+
+def build_preprocessor(numerical, categorical, ordinal=False):
+    """Impute and scale the numbers; one-hot encode the locations, or give each a single integer code."""
+    numerical_pipeline = Pipeline([('imputer', SimpleImputer(strategy='mean')), ('scaler', StandardScaler())])
+    encoder = (OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1) if ordinal else
+               OneHotEncoder(handle_unknown='ignore', sparse_output=False))
+    categorical_pipeline = Pipeline([('imputer', SimpleImputer(strategy='most_frequent')), ('encoder', encoder)])
+    return ColumnTransformer(transformers=[('num', numerical_pipeline, numerical),
+                                           ('cat', categorical_pipeline, categorical)],
+                             remainder='drop')
+
+
+def build_pipeline(numerical, categorical, n_estimators=100, n_jobs=-1, random_state=42):
+    return Pipeline([('preprocessor', build_preprocessor(numerical, categorical)),
+                     ('regressor', RandomForestRegressor(n_estimators=n_estimators, random_state=random_state,
+                                                         n_jobs=n_jobs))])
+
+
+def feature_columns(X, targets, lags=False):
+    numerical = [col for col in weather_features(targets) if col in X.columns] + TIME_FEATURES
+    if lags:
+        numerical += LAG_FEATURES
+    # Location columns holding a single value carry no information, so they are left out.
+    categorical = [col for col in LOCATION_COLUMNS if col in X.columns and X[col].nunique() > 1]
+    return numerical, categorical
+
+
+def split_training_data(df, targets, test_size, random_state, lags=False, split='random'):
+    """Feature lists and a train/test split of `df`, shared by both training modes.
+
+    `split` is 'random', or 'time' to test on the latest `test_size` of
+    the readings, which is what a model forecasting forward will face.
+    """
+    X, y = training_frame(df, targets, lags)
+    if X.empty:
+        raise ValueError('No rows with target values to train on')
+    numerical, categorical = feature_columns(X, targets, lags)
+    if split == 'time':
+        latest = X['Timestamp'] >= X['Timestamp'].quantile(1 - test_size)
+        return numerical, categorical, (X[~latest], X[latest], y[~latest], y[latest])
+    return numerical, categorical, train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+
+def describe_training(df, X_train, targets, numerical, categorical, lags=False):
+    """The part of a model bundle that forecasting needs to know about the training data."""
+    return {
+        'targets': targets,
+        'numerical': numerical,
+        'categorical': categorical,
+        'lags': lags,
+        'feature_means': X_train[[col for col in weather_features(targets) if col in X_train]].mean().to_dict(),
+        'climatology': climatology(df),
+        'locations': locations(df),
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'training_rows': len(X_train),
+        # Readings after this time are new to the model; see update().
+        'watermark': df['Timestamp'].max(),
+    }
+
+
+def train(df, targets=TARGETS, n_estimators=100, n_jobs=-1, test_size=0.2, random_state=42, lags=False,
+          split='random'):
+    """Fit one model for all cities on a split of `df` (see split_training_data).
+
+    Returns the model bundle (the fitted Pipeline plus what forecasting
+    needs to know about the training data) and the held-out (X, y).
+    """
+    targets = list(targets)
+    numerical, categorical, (X_train, X_test, y_train, y_test) = split_training_data(df, targets, test_size,
+                                                                                     random_state, lags, split)
+    model = build_pipeline(numerical, categorical, n_estimators, n_jobs, random_state)
+    model.fit(X_train, y_train if len(targets) > 1 else y_train.iloc[:, 0])
+    bundle = {'model': model, **describe_training(df, X_train, targets, numerical, categorical, lags)}
+    return bundle, (X_test, y_test)
+
+
+def backtest(df, targets=TARGETS, n_splits=5, test_size=0.2, n_estimators=100, n_jobs=-1, random_state=42,
+             lags=False):
+    """Scores of a model refitted on every time-ordered fold (see aqi_features.time_splits)."""
+    targets = list(targets)
+    X, y = training_frame(df, targets, lags)
+    numerical, categorical = feature_columns(X, targets, lags)
+    folds = []
+    for train_rows, test_rows in time_splits(X['Timestamp'], n_splits, test_size):
+        model = build_pipeline(numerical, categorical, n_estimators, n_jobs, random_state)
+        model.fit(X.iloc[train_rows], y.iloc[train_rows] if len(targets) > 1 else y.iloc[train_rows, 0])
+        scores = evaluate({'model': model, 'targets': targets}, X.iloc[test_rows], y.iloc[test_rows])
+        fold = {'Test Start': X['Timestamp'].iloc[test_rows].min(), 'Train Rows': len(train_rows),
+                'Test Rows': len(test_rows)}
+        for target, values in scores.items():
+            fold.update({f'{target} MAE': values['mae'], f'{target} R²': values['r2']})
+        folds.append(fold)
+    return pd.DataFrame(folds)
+
+
+def fit_forest(features, values, n_estimators, random_state):
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=1).fit(features, values)
+
+
+def train_per_city(df, targets=TARGETS, groups=None, processes=None, n_estimators=100, test_size=0.2,
+                   random_state=42, lags=False, split='random'):
+    """Fit one forest per city, or per group of cities, in a process pool.
+
+    `groups` maps city names to a group name; cities not in it get a
+    model of their own. The preprocessing step is fitted and applied once
+    on all cities and shared by every model, so the workers only grow
+    trees. Uses the same train/test split as `train`, so the held-out
+    scores of both modes are comparable.
+
+    Cities with no training rows, such as a new city whose readings are
+    all held out by split='time', are predicted by a POOLED forest grown
+    on every training row.
+    """
+    targets = list(targets)
+    numerical, categorical, (X_train, X_test, y_train, y_test) = split_training_data(df, targets, test_size,
+                                                                                     random_state, lags, split)
+    preprocessor = build_preprocessor(numerical, categorical).fit(X_train)
+    features = preprocessor.transform(X_train)
+    values = y_train.to_numpy() if len(targets) > 1 else y_train.iloc[:, 0].to_numpy()
+    city_groups = {city: (groups or {}).get(city, city) for city in df['City'].astype(str).unique()}
+    row_groups = X_train['City'].astype(str).map(city_groups).to_numpy()
+    trained = set(row_groups)
+    city_groups = {city: group if group in trained else POOLED for city, group in city_groups.items()}
+    fits = {group: row_groups == group for group in sorted(trained)}
+    if POOLED in city_groups.values():
+        fits[POOLED] = np.ones(len(row_groups), dtype=bool)
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {group: pool.submit(fit_forest, features[rows], values[rows], n_estimators, random_state)
+                   for group, rows in fits.items()}
+        models = {group: Pipeline([('preprocessor', preprocessor), ('regressor', future.result())])
+                  for group, future in futures.items()}
+    bundle = {'models': models, 'groups': city_groups,
+              **describe_training(df, X_train, targets, numerical, categorical, lags)}
+    return bundle, (X_test, y_test)
+
+
+def model_groups(bundle):
+    """(group, Pipeline) pairs; the group is None for a single model covering all cities."""
+    return bundle['models'].items() if 'models' in bundle else [(None, bundle['model'])]
+
+
+def keep_lowest_keys(sample, rows, size):
+    """The `size` rows of `sample` and `rows` with the lowest '_key', i.e. a uniform sample of both."""
+    combined = rows if sample is None else pd.concat([sample, rows], ignore_index=True)
+    return combined.nsmallest(size, '_key') if len(combined) > size else combined
+
+
+def train_streaming(source, targets=TARGETS, sample_size=200_000, chunksize=100_000, n_estimators=100, n_jobs=-1,
+                    min_samples_leaf=5, test_size=0.2, random_state=42):
+    """Fit a forest on a uniform sample of an export too large to load at once.
+
+    The CSV is read in chunks of `chunksize` rows. Every chunk updates the
+    training means, the climatology and the watermark, then competes for a
+    place in bounded training and test samples (each row gets a random key
+    and the lowest keys are kept). Memory therefore depends on
+    `sample_size` and `chunksize`, not on the size of the file.
+
+    Locations get one integer code per column instead of a one-hot column
+    per city: one-hot width grows with the number of cities, and forests
+    fit sparse matrices many times slower. `min_samples_leaf` keeps the
+    trees, which grow with the sample, small enough for a small machine.
+    """
+    targets = list(targets)
+    rng = np.random.default_rng(random_state)
+    test_capacity = max(1, int(sample_size * test_size / (1 - test_size)))
+    train_sample = test_sample = climate = places = watermark = None
+    sums = counts = None
+    training_rows = 0
+    for chunk in iter_readings(source, chunksize):
+        climate = climatology(chunk) if climate is None else merge_climatology(climate, climatology(chunk))
+        chunk_places = chunk[LOCATION_COLUMNS].astype(str).drop_duplicates('City')
+        places = chunk_places if places is None else pd.concat([places, chunk_places]).drop_duplicates('City')
+        watermark = chunk['Timestamp'].max() if watermark is None else max(watermark, chunk['Timestamp'].max())
+
+        X, y = training_frame(chunk, targets)
+        rows = pd.concat([X, y], axis=1).assign(_key=rng.random(len(X)))
+        for col in LOCATION_COLUMNS:
+            rows[col] = rows[col].astype(str)
+        is_test = rng.random(len(rows)) < test_size
+        weather = rows.loc[~is_test, weather_features(targets)]
+        sums = weather.sum() if sums is None else sums + weather.sum()
+        counts = weather.count() if counts is None else counts + weather.count()
+        training_rows += int((~is_test).sum())
+        train_sample = keep_lowest_keys(train_sample, rows[~is_test], sample_size)
+        test_sample = keep_lowest_keys(test_sample, rows[is_test], test_capacity)
+    if train_sample is None or train_sample.empty:
+        raise ValueError('No rows with target values to train on')
+
+    samples = []
+    for sample in (train_sample, test_sample):
+        sample = sample.drop(columns='_key')
+        for col in LOCATION_COLUMNS:
+            sample[col] = sample[col].astype('category')
+        samples.append((sample.drop(columns=targets), sample[targets]))
+    (X_train, y_train), test = samples
+    numerical = [col for col in weather_features(targets) if col in X_train.columns] + TIME_FEATURES
+    categorical = [col for col in LOCATION_COLUMNS if X_train[col].nunique() > 1]
+    model = Pipeline([('preprocessor', build_preprocessor(numerical, categorical, ordinal=True)),
+                      ('regressor', RandomForestRegressor(n_estimators=n_estimators, min_samples_leaf=min_samples_leaf,
+                                                          random_state=random_state, n_jobs=n_jobs))])
+    model.fit(X_train, y_train if len(targets) > 1 else y_train.iloc[:, 0])
+
+    city_readings = climate.groupby('City')['Readings'].sum().sort_values(ascending=False, kind='stable')
+    bundle = {
+        'model': model,
+        'targets': targets,
+        'numerical': numerical,
+        'categorical': categorical,
+        'feature_means': (sums / counts).to_dict(),
+        'climatology': climate,
+        'locations': places.set_index('City').loc[city_readings.index].reset_index(),
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'training_rows': training_rows,
+        'sampled_rows': len(X_train),
+        'watermark': watermark,
+    }
+    return bundle, test
+
+
+def set_n_jobs(bundle, n_jobs):
+    for _, model in model_groups(bundle):
+        model.named_steps['regressor'].n_jobs = n_jobs
+
+
+def update(bundle, df, new_trees=10, min_rows=100, max_trees=200):
+    """Grow the model on readings newer than its watermark instead of refitting it.
+
+    Each forest gets `new_trees` trees grown on the new readings only, and
+    the oldest trees are dropped once there are more than `max_trees`, so
+    the forest follows recent conditions and prediction cost stays
+    bounded. Nothing happens until at least `min_rows` new readings have
+    arrived, which keeps new trees from being grown on a handful of rows.
+
+    The fitted preprocessing is kept as it is: the existing trees split
+    on the scaled values it produces, so changing the scaler would move
+    every one of their splits. The averages used for forecast placeholders
+    (training means and the climatology) are updated with the new readings.
+    With per-city models, new cities join the POOLED forest, which is
+    started from their readings if there is none yet; a full retrain gives
+    them a model of their own. Returns the number of readings added.
+    """
+    if 'watermark' not in bundle:
+        raise ValueError('This model was saved without a watermark; retrain it once to enable updates')
+    new = df[df['Timestamp'] > bundle['watermark']]
+    if bundle.get('lags'):
+        # Lag features of the new readings need the hours just before them.
+        X, y = training_frame(df[df['Timestamp'] > bundle['watermark'] - LOOKBACK], bundle['targets'], lags=True)
+        is_new = (X['Timestamp'] > bundle['watermark']).to_numpy()
+        X, y = X[is_new], y[is_new]
+    else:
+        X, y = training_frame(new, bundle['targets'])
+    if len(X) < min_rows:
+        return 0
+    values = y.to_numpy() if len(bundle['targets']) > 1 else y.iloc[:, 0].to_numpy()
+    if 'models' in bundle:
+        add_pooled_cities(bundle, X['City'].astype(str).unique())
+    row_groups = X['City'].astype(str).map(bundle.get('groups', {})).to_numpy()
+    for group, model in model_groups(bundle):
+        rows = np.ones(len(X), dtype=bool) if group is None else row_groups == group
+        if not rows.any():
+            continue
+        forest = model.named_steps['regressor']
+        forest.set_params(warm_start=True, n_estimators=len(getattr(forest, 'estimators_', [])) + new_trees)
+        forest.fit(model.named_steps['preprocessor'].transform(X[rows]), values[rows])
+        del forest.estimators_[:-max_trees]
+        forest.set_params(n_estimators=len(forest.estimators_))
+
+    seen = bundle['training_rows']
+    for col, mean in bundle['feature_means'].items():
+        added = X[col].dropna()
+        if len(added):
+            bundle['feature_means'][col] = (mean * seen + added.sum()) / (seen + len(added))
+    bundle['climatology'] = merge_climatology(bundle['climatology'], climatology(new))
+    places = locations(new)
+    bundle['locations'] = pd.concat([bundle['locations'], places[~places['City'].isin(bundle['locations']['City'])]],
+                                    ignore_index=True)
+    bundle['training_rows'] += len(X)
+    bundle['watermark'] = new['Timestamp'].max()
+    bundle['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    return len(X)
+
+
+def add_pooled_cities(bundle, cities):
+    """Put the `cities` per-city models have never seen in the POOLED group, adding an unfitted forest for it."""
+    added = [city for city in cities if city not in bundle['groups']]
+    if not added:
+        return
+    bundle['groups'].update(dict.fromkeys(added, POOLED))
+    if POOLED not in bundle['models']:
+        model = next(iter(bundle['models'].values()))
+        forest = model.named_steps['regressor']
+        bundle['models'][POOLED] = Pipeline([
+            ('preprocessor', model.named_steps['preprocessor']),
+            ('regressor', RandomForestRegressor(n_estimators=0, random_state=forest.random_state,
+                                                n_jobs=forest.n_jobs)),
+        ])
+
+
+def missing_models(bundle, cities):
+    """The `cities` that per-city models have no model for; always none with one model for all cities."""
+    if 'models' not in bundle:
+        return []
+    return sorted({city for city in cities if bundle['groups'].get(city) not in bundle['models']})
+
+
+def predict(bundle, X):
+    """Predictions as a 2-D array with one column per target.
+
+    With per-city models every row is predicted by its city's model, and
+    rows of cities without one are NaN.
+    """
+    if 'models' not in bundle:
+        return np.asarray(bundle['model'].predict(X)).reshape(len(X), -1)
+    predictions = np.full((len(X), len(bundle['targets'])), np.nan)
+    row_groups = X['City'].astype(str).map(bundle['groups']).to_numpy()
+    for group, model in bundle['models'].items():
+        rows = row_groups == group
+        if rows.any():
+            predictions[rows] = np.asarray(model.predict(X[rows])).reshape(rows.sum(), -1)
+    return predictions
+
+
+def evaluate(bundle, X_test, y_test):
+    """MAE, MSE and R² per target on held-out data."""
+    y_pred = predict(bundle, X_test)
+    return {target: {'mae': mean_absolute_error(y_test.iloc[:, i], y_pred[:, i]),
+                     'mse': mean_squared_error(y_test.iloc[:, i], y_pred[:, i]),
+                     'r2': r2_score(y_test.iloc[:, i], y_pred[:, i])}
+            for i, target in enumerate(bundle['targets'])}
+
+
+def feature_importances(bundle):
+    """Forest feature importances (averaged over all targets and models), most important first."""
+    models = list(bundle['models'].values()) if 'models' in bundle else [bundle['model']]
+    importances = np.mean([model.named_steps['regressor'].feature_importances_ for model in models], axis=0)
+    return pd.DataFrame({'feature': models[0].named_steps['preprocessor'].get_feature_names_out(),
+                         'importance': importances}).sort_values(by='importance', ascending=False)
+
+
+def save_model(bundle, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_model(path):
+    return joblib.load(path)
+
+
+def placeholder_rows(bundle, pairs, climate=None, places=None):
+    """Model inputs for a frame of (City, Forecast Date) pairs, built with one merge against the climatology."""
+    climate = bundle['climatology'] if climate is None else climate
+    places = bundle['locations'] if places is None else places
+    grid = pd.DataFrame({'City': pairs['City'].astype(str), 'Forecast Date': pairs['Forecast Date']})
+    grid['Timestamp'] = grid['Forecast Date'] + pd.Timedelta(hours=12)
+    grid = add_time_features(grid)
+    # When AQI is not a target it is a weather input, so the seasonal AQI is a copy beside it.
+    seasonal = climate.assign(**{'Seasonal AQI': climate[AQI_TARGET]})
+    blend = ['Seasonal AQI'] if AQI_TARGET in bundle['targets'] else []
+    seasonal = seasonal[['City', 'DayOfYear', *blend, *bundle['feature_means']]]
+    grid = grid.merge(places, on='City', how='left').merge(seasonal, on=['City', 'DayOfYear'], how='left')
+    # Days of the year without any readings fall back to the training averages. Lag
+    # features are unknown days ahead, so the model's imputer fills in their averages.
+    grid = grid.fillna(bundle['feature_means'])
+    return grid.reindex(columns=[*grid.columns, *(col for col in bundle['numerical'] if col not in grid.columns)])
+
+
+def forecast_rows(bundle, rows, blend_weight=0.7):
+    """Predict placeholder rows in one batch and lay the results out as the forecast table."""
+    predictions = predict(bundle, rows)
+    output = pd.DataFrame({'Forecast Date': rows['Forecast Date'].dt.strftime('%Y-%m-%d'), 'City': rows['City']})
+    for i, target in enumerate(bundle['targets']):
+        if target == AQI_TARGET:
+            seasonal = rows['Seasonal AQI'].to_numpy(dtype=float)
+            output['Model Predicted AQI'] = predictions[:, i]
+            output['Blended Predicted AQI'] = np.where(
+                np.isnan(seasonal), predictions[:, i], blend_weight * predictions[:, i] + (1 - blend_weight) * seasonal)
+        else:
+            output[f'Predicted {target}'] = predictions[:, i]
+    return output
+
+
+def forecast(bundle, history=None, horizon=5, start=None, cities=None, blend_weight=0.7):
+    """Forecast the targets at noon for `horizon` days from `start` (default: tomorrow).
+
+    Weather inputs are placeholders: the average of all readings for that
+    city on the same day of the year, or the training average when there
+    are none. The AQI forecast is also blended with the historical AQI
+    average for that day, `blend_weight` being the model's share.
+    `cities` is a list of cities or 'all', and defaults to the city with
+    the most readings; `history` defaults to the data the model was
+    trained on. All cities and days are predicted in a single batch.
+    """
+    climate = bundle['climatology'] if history is None else climatology(history)
+    places = bundle['locations'] if history is None else locations(history)
+    cities = list(places['City'][:1] if cities is None else places['City'] if cities == 'all' else cities)
+    unknown = sorted(set(cities) - set(places['City']))
+    if unknown:
+        raise ValueError(f"No readings for {', '.join(unknown)}")
+    unmodelled = missing_models(bundle, cities)
+    if unmodelled:
+        raise ValueError(f"The model has not been trained for {', '.join(unmodelled)}; retrain it to include them")
+    start = pd.Timestamp(start or datetime.now() + timedelta(days=1)).normalize()
+    dates = pd.date_range(start, periods=horizon, freq='D')
+    pairs = pd.MultiIndex.from_product([cities, dates], names=['City', 'Forecast Date']).to_frame(index=False)
+    return forecast_rows(bundle, placeholder_rows(bundle, pairs, climate, places), blend_weight)
@@ -0,0 +1,85 @@
+# aqi_registry.py
+
+import argparse
+import os
+import re
+
+from aqi_pipeline import load_model, save_model
+
+VERSION_FILE = re.compile(r'^v(\d+)\.joblib$')
+
+
+class ModelRegistry:
+    """Numbered versions of model bundles on disk, one of which is current.
+
+    Layout: <root>/<name>/v0001.joblib, v0002.joblib, ... and a CURRENT file
+    holding the live version number. Publishing or activating a version only
+    rewrites CURRENT (atomically), so a running service picks up the change
+    without a restart, and rolling back is activating an older version.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def directory(self, name):
+        return os.path.join(self.root, name)
+
+    def path(self, name, version):
+        return os.path.join(self.directory(name), f'v{version:04d}.joblib')
+
+    def versions(self, name):
+        if not os.path.isdir(self.directory(name)):
+            return []
+        return sorted(int(match.group(1)) for match in map(VERSION_FILE.match, os.listdir(self.directory(name)))
+                      if match)
+
+    def current_version(self, name):
+        try:
+            with open(os.path.join(self.directory(name), 'CURRENT'), encoding='utf-8') as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def activate(self, name, version):
+        if version not in self.versions(name):
+            raise ValueError(f'{name} has no version {version}')
+        current_path = os.path.join(self.directory(name), 'CURRENT')
+        tmp_path = f'{current_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{version}\n')
+        os.replace(tmp_path, current_path)
+
+    def publish(self, name, bundle, activate=True):
+        """Save `bundle` as the next version of `name`; returns the version number."""
+        version = max(self.versions(name), default=0) + 1
+        save_model(bundle, self.path(name, version))
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def load(self, name, version=None):
+        """(version, bundle) for `version`, by default the current one."""
+        version = self.current_version(name) if version is None else version
+        if version is None:
+            raise ValueError(f'No current version of {name} in {self.root}')
+        return version, load_model(self.path(name, version))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or activate versions in the AQI model registry.")
+    parser.add_argument('--registry', default='models', help="registry directory")
+    parser.add_argument('--name', default='aqi', help="model name")
+    parser.add_argument('--activate', type=int, metavar='VERSION', help="make this version current")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.registry)
+    if args.activate is not None:
+        registry.activate(args.name, args.activate)
+    current = registry.current_version(args.name)
+    for version in registry.versions(args.name):
+        bundle_path = registry.path(args.name, version)
+        print(f"{'*' if version == current else ' '} v{version:04d}  {os.path.getsize(bundle_path) / 1024 / 1024:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+# aqi_service.py
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from aqi_pipeline import forecast_rows, missing_models, placeholder_rows, set_n_jobs
+from aqi_registry import ModelRegistry
+
+log = logging.getLogger(__name__)
+
+MAX_HORIZON = 366
+
+
+class LRUCache:
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class MicroBatcher:
+    """Predicts the (city, date) pairs of all requests arriving within `delay` seconds in one batch.
+
+    `predict_pairs` takes a list of distinct (version, city, date) keys and
+    returns a dict of key -> forecast row. It only ever runs on the batcher's own thread,
+    so the model is never used by two threads at once.
+    """
+
+    def __init__(self, predict_pairs, delay=0.002, max_pairs=50_000):
+        self.predict_pairs = predict_pairs
+        self.delay = delay
+        self.max_pairs = max_pairs
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.pairs = 0
+        threading.Thread(target=self.run, name='micro-batcher', daemon=True).start()
+
+    def submit(self, pairs):
+        future = Future()
+        self.queue.put((pairs, future))
+        return future.result()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.delay
+            while size < self.max_pairs:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                size += len(batch[-1][0])
+            self.flush(batch)
+
+    def flush(self, batch):
+        pairs = list(dict.fromkeys(pair for requested, _ in batch for pair in requested))
+        self.batches += 1
+        self.pairs += len(pairs)
+        try:
+            results = self.predict_pairs(pairs)
+        except Exception as e:
+            log.exception("Batch of %d forecast pairs failed", len(pairs))
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for requested, future in batch:
+            future.set_result([results[pair] for pair in requested])
+
+
+class ForecastService:
+    """Serves forecasts from the registry's current model, kept loaded in memory.
+
+    Forecast rows are cached per (model version, city, date); the rest go
+    through the micro-batcher. The registry is checked for a newly
+    activated version at most every `check_interval` seconds, and a new
+    version is swapped in without interrupting requests.
+    """
+
+    def __init__(self, registry, name='aqi', cache_size=100_000, batch_delay=0.002, check_interval=1.0):
+        self.registry = registry
+        self.name = name
+        self.check_interval = check_interval
+        self.checked = time.monotonic()
+        self.swap_lock = threading.Lock()
+        self.current = self.load(None)
+        self.cache = LRUCache(cache_size)
+        self.batcher = MicroBatcher(self.predict_pairs, batch_delay)
+
+    def load(self, version):
+        version, bundle = self.registry.load(self.name, version)
+        # Batches are small and frequent, so forking joblib workers for each would cost more than it saves.
+        set_n_jobs(bundle, 1)
+        log.info("Serving %s version %d", self.name, version)
+        # Swapped as one tuple, so readers always see a matching version, bundle and city list.
+        cities = list(bundle['locations']['City'])
+        unmodelled = set(missing_models(bundle, cities))
+        return version, bundle, [city for city in cities if city not in unmodelled]
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked < self.check_interval or not self.swap_lock.acquire(blocking=False):
+            return
+        try:
+            self.checked = now
+            version = self.registry.current_version(self.name)
+            if version is not None and version != self.current[0]:
+                self.current = self.load(version)
+        finally:
+            self.swap_lock.release()
+
+    def predict_pairs(self, keys):
+        """Forecast rows for (version, city, date) keys; None for keys of a version that is no longer loaded."""
+        version, bundle, _ = self.current
+        current = [key for key in keys if key[0] == version]
+        results = dict.fromkeys(keys)
+        if current:
+            frame = pd.DataFrame([key[1:] for key in current], columns=['City', 'Forecast Date'])
+            frame['Forecast Date'] = pd.to_datetime(frame['Forecast Date'])
+            table = forecast_rows(bundle, placeholder_rows(bundle, frame)).astype(object)
+            # NaN is not valid JSON; a missing prediction is sent as null.
+            for key, row in zip(current, table.where(table.notna(), None).to_dict('records')):
+                self.cache.put(key, row)
+                results[key] = row
+        return results
+
+    def expand(self, spec, cities):
+        """The (city, date) pairs of one request: {"cities": [...], "start": "YYYY-MM-DD", "horizon": N}.
+
+        "cities" may also be a single city name, or "all".
+        """
+        wanted = spec.get('cities') or cities[:1]
+        if isinstance(wanted, str):
+            wanted = [wanted]
+        if not isinstance(wanted, list) or not all(isinstance(city, str) for city in wanted):
+            raise ValueError('cities must be a city name, a list of city names or "all"')
+        wanted = cities if wanted == ['all'] else wanted
+        unknown = sorted(set(wanted) - set(cities))
+        if unknown:
+            raise ValueError(f"No forecasts for {', '.join(unknown)}")
+        horizon = int(spec.get('horizon', 5))
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f'horizon must be between 1 and {MAX_HORIZON}')
+        start = pd.Timestamp(spec.get('start') or datetime.now() + timedelta(days=1)).normalize()
+        dates = [(start + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(horizon)]
+        return [(city, date) for city in wanted for date in dates]
+
+    def forecast(self, specs):
+        """The model version and its forecast rows for a list of request specs, uncached pairs predicted in one batch.
+
+        If a new version is swapped in before the batch runs, the request is
+        answered again from the new version, so the rows always match the
+        version returned with them.
+        """
+        self.refresh()
+        while True:
+            version, _, cities = self.current
+            requested = [[(version, *pair) for pair in self.expand(spec, cities)] for spec in specs]
+            rows = {}
+            missing = []
+            for key in dict.fromkeys(key for keys in requested for key in keys):
+                row = self.cache.get(key)
+                if row is None:
+                    missing.append(key)
+                else:
+                    rows[key] = row
+            if missing:
+                rows.update(zip(missing, self.batcher.submit(missing)))
+            if all(row is not None for row in rows.values()):
+                return version, [[rows[key] for key in keys] for keys in requested]
+
+    def stats(self):
+        return {
+            'model': self.name,
+            'version': self.current[0],
+            'cache_entries': len(self.cache.entries),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'batches': self.batcher.batches,
+            'pairs_predicted': self.batcher.pairs,
+        }
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    """GET /forecast?city=...&start=...&horizon=..., POST /forecast {"requests": [...]}, GET /health."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; with Nagle on, keep-alive clients wait out a delayed ACK for each.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self.send_json(200, self.server.service.stats())
+        elif url.path == '/forecast':
+            query = parse_qs(url.query)
+            spec = {'cities': query.get('city'), 'start': query.get('start', [None])[0],
+                    'horizon': query.get('horizon', [5])[0]}
+            self.answer([spec], single=True)
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/forecast':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            specs = body['requests']
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': 'expected a JSON body like {"requests": [{"cities": [...]}]}'})
+            return
+        self.answer(specs, single=False)
+
+    def answer(self, specs, single):
+        service = self.server.service
+        try:
+            version, results = service.forecast(specs)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        payload = {'model': service.name, 'version': version}
+        payload.update({'forecasts': results[0]} if single else {'results': results})
+        self.send_json(200, payload)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+def make_server(service, host='127.0.0.1', port=8765):
+    server = ThreadingHTTPServer((host, port), ForecastHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve AQI forecasts from the model registry over HTTP.")
+    parser.add_argument('--registry', default='models', help="registry directory")
+    parser.add_argument('--name', default='aqi', help="model name in the registry")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-size', type=int, default=100_000, help="forecast rows kept in the cache")
+    parser.add_argument('--batch-delay-ms', type=float, default=2.0,
+                        help="how long uncached requests wait to be batched with others")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    service = ForecastService(ModelRegistry(args.registry), args.name, args.cache_size, args.batch_delay_ms / 1000)
+    server = make_server(service, args.host, args.port)
+    log.info("Listening on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
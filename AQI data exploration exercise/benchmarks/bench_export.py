@@ -0,0 +1,64 @@
+# bench_export.py
+#
+# Exports a synthetic export of N readings to a fresh SQLite database, minus
+# its last day, then exports the whole export again so only that day is new.
+# Prints the time of both, the database size, and how long a Metabase-style
+# question (daily mean AQI per city for the last 30 days) takes against the
+# raw readings and against the daily rollup.
+# Run from the "AQI data exploration exercise" directory:
+#
+#     python -m benchmarks.bench_export --rows 1000000
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import pandas as pd
+
+from aqi_export import connect, export_readings
+from benchmarks.synthetic import load_export, scaled
+
+RAW_QUERY = """SELECT city, date(timestamp) AS day, AVG(aqi_us) FROM readings
+               WHERE timestamp >= ? GROUP BY city, day"""
+ROLLUP_QUERY = 'SELECT city, day, aqi_us_mean FROM readings_daily WHERE day >= ?'
+
+
+def time_query(conn, sql, since, rounds=5):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        rows = conn.execute(sql, (since,)).fetchall()
+    return (time.perf_counter() - start) / rounds, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the SQLite export and rollup queries.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    args = parser.parse_args()
+
+    df = scaled(load_export(), args.rows)
+    last_day = df['Timestamp'].max() - pd.Timedelta(days=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'aqi.db')
+        conn = connect(path)
+        start = time.perf_counter()
+        written = export_readings(conn, df[df['Timestamp'] <= last_day], batch_size=args.batch_size)
+        seconds = time.perf_counter() - start
+        print(f"initial export: {written} readings in {seconds:.1f}s ({written / seconds:,.0f}/s), "
+              f"database {os.path.getsize(path) / 1024 / 1024:.0f} MB")
+        start = time.perf_counter()
+        written = export_readings(conn, df, batch_size=args.batch_size)
+        print(f"next day: {written} new readings in {time.perf_counter() - start:.2f}s")
+        print(f"peak memory (max RSS): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        since = (df['Timestamp'].max() - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+        for label, sql in (('raw readings', RAW_QUERY), ('daily rollup', ROLLUP_QUERY)):
+            seconds, rows = time_query(conn, sql, since)
+            print(f"  30-day daily AQI per city from {label + ':':14} {seconds * 1000:8.1f} ms ({rows} rows)")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
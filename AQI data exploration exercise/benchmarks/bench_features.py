@@ -0,0 +1,63 @@
+# bench_features.py
+#
+# Times aqi_features.lag_features on the bundled export and on synthetic
+# exports of growing size (the bundled one copied out to more cities), and
+# prints the time per reading, which stays flat if the cost is linear. On the
+# bundled export it also times a plain per-row loop computing just the 24h
+# AQI mean, for comparison. Run from the "AQI data exploration exercise"
+# directory:
+#
+#     python -m benchmarks.bench_features --rows 1000000 2000000 5000000 10000000
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aqi_features import lag_features
+from benchmarks.synthetic import load_export, scaled
+
+
+def loop_mean_24h(df):
+    """The per-row way: filter each reading's city and window, then average."""
+    means = np.empty(len(df))
+    for i, (city, timestamp) in enumerate(zip(df['City'], df['Timestamp'])):
+        window = df[(df['City'] == city) & (df['Timestamp'] < timestamp) &
+                    (df['Timestamp'] >= timestamp - pd.Timedelta(hours=24))]
+        means[i] = window['AQI (US)'].mean()
+    return means
+
+
+def time_features(df):
+    start = time.perf_counter()
+    lag_features(df)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lag and rolling feature computation.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 2_000_000, 5_000_000, 10_000_000])
+    parser.add_argument('--loop-rows', type=int, default=2000, help="readings timed with the per-row loop")
+    args = parser.parse_args()
+
+    export = load_export()
+    seconds = time_features(export)
+    print(f"bundled export, {len(export)} readings: {seconds:.3f}s ({seconds / len(export) * 1e9:.0f} ns/reading)")
+    sample = export.head(args.loop_rows)
+    start = time.perf_counter()
+    loop_mean_24h(sample)
+    loop_seconds = time.perf_counter() - start
+    print(f"  per-row loop, first {len(sample)} readings, 24h mean only: {loop_seconds:.2f}s "
+          f"({loop_seconds / len(sample) * 1e9:.0f} ns/reading)")
+
+    for rows in args.rows:
+        df = scaled(export, rows)
+        seconds = time_features(df)
+        print(f"synthetic, {rows} readings, {df['City'].nunique()} cities: {seconds:.2f}s "
+              f"({seconds / rows * 1e9:.0f} ns/reading)")
+        del df
+
+
+if __name__ == '__main__':
+    main()
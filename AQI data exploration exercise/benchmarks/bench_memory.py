@@ -0,0 +1,61 @@
+# bench_memory.py
+#
+# Writes a synthetic export of N readings (the bundled one copied out to more
+# cities), then trains on it in a fresh process per mode and reports each
+# process's peak memory (max RSS) and time: the regular in-memory training and
+# the chunked streaming mode. Run from the "AQI data exploration exercise"
+# directory:
+#
+#     python -m benchmarks.bench_memory --rows 1000000 --trees 20
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.synthetic import load_export, scaled, write_export
+
+
+def run_mode(mode, path, args, results):
+    from aqi_data import load_readings
+    from aqi_pipeline import evaluate, train, train_streaming
+
+    start = time.perf_counter()
+    if mode == 'in memory':
+        bundle, test = train(load_readings(path, use_cache=False), n_estimators=args.trees)
+    else:
+        bundle, test = train_streaming(path, n_estimators=args.trees, sample_size=args.sample_size,
+                                       chunksize=args.chunk_size)
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((mode, seconds, peak_mb, evaluate(bundle, *test)['AQI (US)']['mae']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of in-memory and streaming training.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--trees', type=int, default=20)
+    parser.add_argument('--sample-size', type=int, default=200_000)
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--modes', nargs='+', default=['in memory', 'streaming'])
+    args = parser.parse_args()
+
+    # Each mode runs in a fresh process, so one mode's peak cannot hide the other's.
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'export.csv')
+        write_export(scaled(load_export(), args.rows), path)
+        print(f"{args.rows} readings, {os.path.getsize(path) / 1024 / 1024:.0f} MB CSV, {args.trees} trees")
+        for mode in args.modes:
+            results = context.Queue()
+            process = context.Process(target=run_mode, args=(mode, path, args, results))
+            process.start()
+            mode, seconds, peak_mb, mae = results.get()
+            process.join()
+            print(f"  {mode:10} {seconds:7.1f}s  peak RSS {peak_mb:7.0f} MB  AQI MAE {mae:.2f}")
+
+
+if __name__ == '__main__':
+    main()
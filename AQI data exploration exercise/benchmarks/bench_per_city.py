@@ -0,0 +1,49 @@
+# bench_per_city.py
+#
+# Trains on the bundled export copied out to N cities: once as a single model
+# for all cities (the baseline) and once as one model per city with 1, 2 and 4
+# worker processes. Prints wall time, held-out scores and the time to
+# forecast every city. Run from the "AQI data exploration exercise" directory:
+#
+#     python -m benchmarks.bench_per_city --cities 4 --processes 1 2 4
+
+import argparse
+import os
+import time
+
+from aqi_pipeline import evaluate, forecast, train, train_per_city
+from benchmarks.synthetic import load_export, multi_city
+
+
+def report(label, seconds, bundle, test, horizon):
+    scores = evaluate(bundle, *test)
+    start = time.perf_counter()
+    table = forecast(bundle, horizon=horizon, cities=list(bundle['locations']['City']))
+    forecast_seconds = time.perf_counter() - start
+    aqi = scores['AQI (US)']
+    print(f"  {label:24} train {seconds:7.2f}s  AQI MAE {aqi['mae']:5.2f} R² {aqi['r2']:.3f}  "
+          f"forecast {len(table)} rows {forecast_seconds * 1000:6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare one model for all cities with per-city models.")
+    parser.add_argument('--cities', type=int, default=4)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--horizon', type=int, default=30)
+    args = parser.parse_args()
+
+    df = multi_city(load_export(), args.cities)
+    print(f"{len(df)} readings, {args.cities} cities, {args.trees} trees per model, {os.cpu_count()} CPU cores")
+
+    start = time.perf_counter()
+    bundle, test = train(df, n_estimators=args.trees, n_jobs=-1)
+    report("single model (n_jobs=-1)", time.perf_counter() - start, bundle, test, args.horizon)
+    for processes in args.processes:
+        start = time.perf_counter()
+        bundle, test = train_per_city(df, processes=processes, n_estimators=args.trees)
+        report(f"per city, {processes} processes", time.perf_counter() - start, bundle, test, args.horizon)
+
+
+if __name__ == '__main__':
+    main()
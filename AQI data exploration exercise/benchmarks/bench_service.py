@@ -0,0 +1,104 @@
+# bench_service.py
+#
+# Publishes a model trained on a multi-city copy of the bundled export to a
+# temporary registry, starts aqi_service on a free port and sends forecast
+# requests from several client threads over keep-alive connections. Prints
+# the p50/p99 latency of the first (uncached) and second (cached) round,
+# how many batched predict calls the service made, and the time of calling
+# forecast() once per request for comparison.
+# Run from the "AQI data exploration exercise" directory:
+#
+#     python -m benchmarks.bench_service --cities 10 --clients 8 --requests 50
+
+import argparse
+import http.client
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from aqi_pipeline import forecast, set_n_jobs, train
+from aqi_registry import ModelRegistry
+from aqi_service import ForecastService, make_server
+from benchmarks.synthetic import load_export, multi_city
+
+
+def client(port, paths, latencies):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    for path in paths:
+        start = time.perf_counter()
+        connection.request('GET', path)
+        response = connection.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            raise RuntimeError(f'{path}: {response.status} {body!r}')
+    connection.close()
+
+
+def run_round(port, requests, clients):
+    latencies = []
+    threads = [threading.Thread(target=client, args=(port, requests[number::clients], latencies))
+               for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def percentile(values, share):
+    return sorted(values)[min(len(values) - 1, int(len(values) * share))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure forecast service latency with and without its cache.")
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help="requests per client per round")
+    parser.add_argument('--horizon', type=int, default=7)
+    parser.add_argument('--trees', type=int, default=50)
+    args = parser.parse_args()
+
+    df = multi_city(load_export(), args.cities)
+    bundle, _ = train(df, n_estimators=args.trees)
+    cities = list(bundle['locations']['City'])
+    start = (df['Timestamp'].max() + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    rng = random.Random(1)
+    requests = [(rng.choice(cities), rng.randrange(args.horizon)) for _ in range(args.clients * args.requests)]
+    paths = [f'/forecast?city={city.replace(" ", "+")}&start={pd.Timestamp(start) + pd.Timedelta(days=offset):%Y-%m-%d}'
+             f'&horizon={args.horizon}' for city, offset in requests]
+
+    with tempfile.TemporaryDirectory() as root:
+        registry = ModelRegistry(root)
+        registry.publish('aqi', bundle)
+        service = ForecastService(registry)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        print(f"{len(paths)} requests of {args.horizon} days for {args.cities} cities from {args.clients} clients")
+        for label in ('uncached', 'cached'):
+            seconds, latencies = run_round(port, paths, args.clients)
+            print(f"  {label:8}  {len(paths) / seconds:7.0f} req/s  p50 {percentile(latencies, 0.5):7.2f} ms  "
+                  f"p99 {percentile(latencies, 0.99):7.2f} ms")
+        stats = service.stats()
+        print(f"  {stats['batches']} batched predict calls for {stats['pairs_predicted']} (city, date) pairs")
+        server.shutdown()
+        server.server_close()
+
+    set_n_jobs(bundle, 1)
+    seconds = []
+    for city, offset in requests[:100]:
+        begin = time.perf_counter()
+        forecast(bundle, horizon=args.horizon, start=pd.Timestamp(start) + pd.Timedelta(days=offset), cities=[city])
+        seconds.append(time.perf_counter() - begin)
+    print(f"  forecast() per request: p50 {statistics.median(seconds) * 1000:7.2f} ms "
+          f"(one predict call each, single-threaded)")
+
+
+if __name__ == '__main__':
+    main()
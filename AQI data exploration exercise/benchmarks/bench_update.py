@@ -0,0 +1,62 @@
+# bench_update.py
+#
+# Trains on all but the last days of the bundled export, then replays those
+# days in batches as if they were new readings arriving. Every batch is added
+# once with update() and once by retraining from scratch on everything seen so
+# far. Prints the time of both and the AQI error on the day after each batch.
+# Run from the "AQI data exploration exercise" directory:
+#
+#     python -m benchmarks.bench_update --days 10 --batch-days 2
+
+import argparse
+import copy
+import time
+
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+from aqi_pipeline import predict, train, training_frame, update
+from benchmarks.synthetic import load_export
+
+
+def next_day_error(bundle, df, after):
+    X, y = training_frame(df[(df['Timestamp'] > after) & (df['Timestamp'] <= after + pd.Timedelta(days=1))],
+                          bundle['targets'])
+    if X.empty:
+        return float('nan')
+    return mean_absolute_error(y.iloc[:, 0], predict(bundle, X)[:, 0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incremental model updates with full retraining.")
+    parser.add_argument('--days', type=int, default=10, help="days at the end of the export replayed as new data")
+    parser.add_argument('--batch-days', type=float, default=2)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--new-trees', type=int, default=10)
+    args = parser.parse_args()
+
+    df = load_export().sort_values('Timestamp', ignore_index=True)
+    cutoff = df['Timestamp'].max() - pd.Timedelta(days=args.days)
+    incremental, _ = train(df[df['Timestamp'] <= cutoff], n_estimators=args.trees)
+    print(f"trained on {incremental['training_rows']} readings up to {cutoff}")
+
+    seen = cutoff
+    batch = pd.Timedelta(days=args.batch_days)
+    # Stops while there is still a day after the batch to score against.
+    while seen + batch + pd.Timedelta(days=1) <= df['Timestamp'].max():
+        seen += batch
+        history = df[df['Timestamp'] <= seen]
+        before = copy.deepcopy(incremental)
+        start = time.perf_counter()
+        added = update(incremental, history, new_trees=args.new_trees, min_rows=1)
+        update_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        retrained, _ = train(history, n_estimators=args.trees)
+        retrain_seconds = time.perf_counter() - start
+        print(f"  +{added:4} readings  update {update_seconds:6.2f}s  retrain {retrain_seconds:6.2f}s  "
+              f"next-day AQI MAE: stale {next_day_error(before, df, seen):5.2f}  "
+              f"updated {next_day_error(incremental, df, seen):5.2f}  retrained {next_day_error(retrained, df, seen):5.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# suite.py
+#
+# The AQI cases of the repository's benchmark suite: CSV loading, time and
+# lag features, the ColumnTransformer, forest training, forecasting and the
+# SQLite export, on the bundled export and on a synthetic export scaled up to
+# more cities. They are timed, recorded and compared by bench_suite.py at the
+# repository root:
+#
+#     python bench_suite.py --project aqi
+
+import os
+
+from aqi_data import load_readings, read_readings
+from aqi_export import connect, export_readings
+from aqi_features import lag_features
+from aqi_pipeline import (add_time_features, build_pipeline, build_preprocessor, feature_columns, forecast, train,
+                          training_frame)
+from benchmarks.synthetic import EXPORT, load_export, multi_city, scaled, write_export
+
+
+def cases(workdir, quick=False):
+    """Name -> function to time. Everything the functions read is prepared here, outside the timings."""
+    export = load_export()
+    big = scaled(export, 100_000 if quick else 500_000)
+    big_csv = os.path.join(workdir, 'export.csv')
+    write_export(big, big_csv)
+    cache_dir = os.path.join(workdir, 'cache')
+    load_readings(big_csv, cache_dir=cache_dir)
+
+    X, y = training_frame(export)
+    numerical, categorical = feature_columns(X, list(y.columns))
+    X_big, _ = training_frame(big)
+    numerical_big, categorical_big = feature_columns(X_big, list(y.columns))
+
+    bundle, _ = train(export, n_estimators=20, n_jobs=1)
+    cities_bundle, _ = train(multi_city(export, 5), n_estimators=10, n_jobs=1)
+
+    return {
+        'read_csv.export': lambda: read_readings(EXPORT),
+        'read_csv.scaled': lambda: read_readings(big_csv),
+        'load_cached.scaled': lambda: load_readings(big_csv, cache_dir=cache_dir),
+        'time_features.scaled': lambda: add_time_features(big),
+        'lag_features.scaled': lambda: lag_features(big),
+        'preprocess_fit_transform.export': lambda: build_preprocessor(numerical, categorical).fit_transform(X),
+        'preprocess_fit_transform.scaled':
+            lambda: build_preprocessor(numerical_big, categorical_big).fit_transform(X_big),
+        'forest_fit.export': lambda: build_pipeline(numerical, categorical, n_estimators=20, n_jobs=1).fit(X, y),
+        'forecast.5_days': lambda: forecast(bundle, export, horizon=5),
+        'forecast.365_days_5_cities': lambda: forecast(cities_bundle, horizon=365, cities='all'),
+        'sqlite_export.export': lambda: export_readings(connect(':memory:'), export),
+    }
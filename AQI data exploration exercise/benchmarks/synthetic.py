@@ -0,0 +1,49 @@
+# synthetic.py
+#
+# Larger, multi-city versions of the bundled export for the benchmarks. Every
+# extra city is a copy of the real readings with its own AQI and temperature
+# offset and a little noise, so the per-city patterns differ.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from aqi_data import LOCATION_COLUMNS, load_readings
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_export_June05_2025.csv')
+
+
+def load_export():
+    return load_readings(EXPORT)
+
+
+def multi_city(df, cities, seed=1):
+    """`cities` copies of `df`, the first one unchanged, the others as "City 2", "City 3", ..."""
+    rng = np.random.default_rng(seed)
+    parts = [df]
+    for number in range(2, cities + 1):
+        part = df.copy()
+        part['City'] = f'City {number}'
+        part['State'] = f'State {number}'
+        part['AQI (US)'] = (part['AQI (US)'] * rng.uniform(0.6, 1.6) +
+                            rng.normal(0, 3, len(part))).clip(lower=0).astype('float32')
+        part['Temperature (°C)'] = (part['Temperature (°C)'] + rng.uniform(-8, 8)).astype('float32')
+        parts.append(part)
+    combined = pd.concat(parts, ignore_index=True)
+    for col in LOCATION_COLUMNS:
+        combined[col] = combined[col].astype(str).astype('category')
+    return combined
+
+
+def scaled(df, rows, seed=1):
+    """About `rows` readings, made by adding cities to `df`."""
+    return multi_city(df, -(-rows // len(df)), seed).head(rows)
+
+
+def write_export(df, path):
+    """Write readings back out in the export's CSV layout."""
+    out = df.drop(columns='Timestamp')
+    out.insert(0, 'Date', df['Timestamp'].dt.strftime('%m/%d/%Y'))
+    out.insert(1, 'Time', df['Timestamp'].dt.strftime('%H:%M:%S'))
+    out.to_csv(path, index=False)
@@ -0,0 +1,66 @@
+# bench_api.py
+#
+# Compares lookups scraped from the wiki and GW2TP with lookups served by the
+# official GW2 API through a warm name index, for N lookups that arrive at
+# the same time. Both run against the stub server with the same latency.
+# Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.bench_api --lookups 20 --latency 0.15
+
+import argparse
+import asyncio
+import time
+
+from cache import TTLCache
+from benchmarks.fakes import FakeMessage, api_routes, corpus_pages, make_bot
+from benchmarks.stub_server import StubServer
+
+ITEMS = ["Mystic Coin", "The Bifrost"]
+
+
+async def run(lookups, latency, use_api):
+    async with StubServer(latency=latency, routes=api_routes()) as server:
+        server.pages.update(corpus_pages(server.base_url))
+        bot = make_bot(server.base_url, use_api=use_api)
+        bot.price_budget = None
+        bot.scheduler.workers = lookups
+        await bot.fetcher.start()
+        try:
+            if use_api:
+                # Warm the name index the way earlier wiki lookups would.
+                for name in ITEMS:
+                    await bot.on_message(FakeMessage(bot.user, name))
+                    await bot.scheduler.join()
+            bot.item_cache = TTLCache(maxsize=0)
+            bot.price_cache = TTLCache(maxsize=0)
+            server.hits.clear()
+            server.bytes_sent = 0
+
+            start = time.perf_counter()
+            await asyncio.gather(*(bot.on_message(FakeMessage(bot.user, ITEMS[i % len(ITEMS)]))
+                                   for i in range(lookups)))
+            await bot.scheduler.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            await bot.scheduler.stop()
+            await bot.fetcher.close()
+        return elapsed, sum(server.hits.values()), server.bytes_sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wiki scraping vs the official GW2 API.")
+    parser.add_argument("--lookups", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    print(f"{args.lookups} concurrent lookups, {args.latency * 1000:.0f} ms injected latency per request")
+    results = {}
+    for label, use_api in (("wiki + GW2TP", False), ("GW2 API", True)):
+        elapsed, requests, sent = asyncio.run(run(args.lookups, args.latency, use_api))
+        results[label] = elapsed
+        print(f"  {label + ':':14} {elapsed:.3f}s  {requests:4} upstream requests  {sent / 1024:8.1f} KB")
+    print(f"  speedup: {results['wiki + GW2TP'] / results['GW2 API']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
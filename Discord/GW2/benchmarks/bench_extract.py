@@ -0,0 +1,141 @@
+# bench_extract.py
+#
+# Times item extraction over a corpus of saved wiki pages: the original
+# full-page BeautifulSoup scrape against extractor.py with lxml and with its
+# html.parser fallback. Every page must produce the same result in all three.
+# Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.bench_extract --corpus benchmarks/corpus --chrome-kb 150
+#
+# Pages saved from the live wiki carry ~150 KB of navigation, scripts and
+# footer around the article; --chrome-kb pads the small bundled pages to that size.
+
+import argparse
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+import extractor
+
+WIKI_BASE = "https://wiki.guildwars2.com"
+
+
+def legacy_extract(page, item_url, item_name):
+    """The scrape bot.py used before extractor.py: one full html.parser tree, one search per field."""
+    soup = BeautifulSoup(page, "html.parser")
+    infobox = soup.select_one("div.infobox")
+    if not infobox:
+        return None, None
+    item_data = {"wiki_url": item_url}
+    recipe_data = {}
+
+    def get_field(field_name):
+        try:
+            return infobox.find("dt", string=lambda t: t and t.strip().lower() == field_name.lower()
+                                ).find_next_sibling("dd").text.strip()
+        except AttributeError:
+            return None
+
+    item_data['name'] = infobox.select_one(".heading").text.strip() if infobox.select_one(".heading") else item_name
+    icon_tag = infobox.select_one(".infobox-icon img")
+    if icon_tag and icon_tag.has_attr('src'):
+        item_data["icon_url"] = f"{WIKI_BASE}{icon_tag['src']}"
+    try:
+        description_text = soup.select_one("#mw-content-text .mw-parser-output > p").text.strip()
+        item_data["description"] = description_text.removesuffix("— In-game description").strip()
+    except AttributeError:
+        item_data["description"] = "No description available."
+    rarity_text = get_field("Rarity")
+    item_data['rarity'] = rarity_text[1:] if rarity_text and len(rarity_text) > 1 else rarity_text
+    item_data['type'] = get_field("Item type") or get_field("Type")
+    item_data['req_level'] = get_field("Req. level")
+    item_data['binding'] = get_field("Binding")
+    if infobox.has_attr('data-id'):
+        item_data['api_id'] = infobox['data-id']
+    else:
+        api_link = soup.find('a', href=re.compile(r'api\.guildwars2\.com/v2/items\?ids='))
+        if api_link:
+            item_data['api_id'] = api_link['href'].split('ids=')[1].split('&')[0]
+    gw2tp_link = soup.find("a", string="GW2TP")
+    if gw2tp_link and gw2tp_link.has_attr('href'):
+        item_data['tp_url'] = gw2tp_link['href']
+    recipe_box = soup.find('div', {'class': 'recipe-box'})
+    if recipe_box:
+        try:
+            recipe_data["output_qty"] = recipe_box.find('dt', string='Output qty.').find_next_sibling('dd').text.strip()
+            ingredients_section = recipe_box.find('div', {'class': 'ingredients'})
+            if ingredients_section:
+                recipe_data["ingredients_list"] = [
+                    f"{ing.find_previous_sibling('dt').text.strip()} {ing.text.strip()}"
+                    for ing in ingredients_section.find_all('dd')]
+        except AttributeError:
+            pass
+    return item_data, recipe_data
+
+
+def add_chrome(page, kilobytes):
+    """Surround the article with MediaWiki-style head scripts, sidebar and footer."""
+    if not kilobytes:
+        return page
+    link = '<li class="mw-list-item"><a href="/wiki/Special:Page_{0}" title="Page {0}">Page {0}</a></li>\n'
+    per_side = kilobytes * 1024 // 2
+    nav, i = [], 0
+    while sum(map(len, nav)) < per_side:
+        nav.append(link.format(i))
+        i += 1
+    script = "<script>RLCONF={" + ",".join(f'"wg{i}":"{"x" * 40}"' for i in range(per_side // 100)) + "};</script>"
+    page = page.replace("</head>", script + "</head>", 1)
+    sidebar = '<div class="printfooter">Retrieved from wiki</div><div id="catlinks"></div><div id="mw-panel"><ul>' \
+              + "".join(nav) + "</ul></div>"
+    return page.replace("</body>", sidebar + "</body>", 1)
+
+
+def time_extract(function, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name, page in pages:
+            function(page, WIKI_BASE + "/wiki/" + name, name)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wiki item extraction.")
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "corpus"))
+    parser.add_argument("--chrome-kb", type=int, default=150)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for filename in sorted(os.listdir(args.corpus)):
+        if not filename.endswith(".html") or filename.startswith("gw2tp_"):
+            continue
+        with open(os.path.join(args.corpus, filename), encoding="utf-8") as f:
+            pages.append((filename.removesuffix(".html"), add_chrome(f.read(), args.chrome_kb)))
+
+    def fast_lxml(page, url, name):
+        return extractor.extract_item_data(page, url, name, WIKI_BASE)
+
+    def fast_soup(page, url, name):
+        return extractor.extract_item_data(page, url, name, WIKI_BASE, use_lxml=False)
+
+    for name, page in pages:
+        expected = legacy_extract(page, WIKI_BASE + "/wiki/" + name, name)
+        for label, function in (("lxml", fast_lxml), ("html.parser", fast_soup)):
+            result = function(page, WIKI_BASE + "/wiki/" + name, name)
+            assert result == expected, f"{label} extraction differs on {name}: {result} != {expected}"
+
+    print(f"{len(pages)} pages, ~{sum(len(p) for _, p in pages) // len(pages) // 1024} KB each, {args.rounds} rounds")
+    baseline = time_extract(legacy_extract, pages, args.rounds)
+    print(f"  legacy full-page html.parser: {baseline * 1000:8.2f} ms/page")
+    for label, function in (("extractor, html.parser", fast_soup), ("extractor, lxml", fast_lxml)):
+        if label.endswith("lxml") and extractor.lxml is None:
+            print(f"  {label}: skipped, lxml is not installed")
+            continue
+        seconds = time_extract(function, pages, args.rounds)
+        print(f"  {label + ':':29} {seconds * 1000:8.2f} ms/page  ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# bench_fetch.py
+#
+# Compares the old blocking fetch (a synchronous HTTP call made from inside
+# the event loop) with the pooled async Fetcher, for N lookups that arrive at
+# the same time. Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.bench_fetch --lookups 20 --latency 0.2
+
+import argparse
+import asyncio
+import time
+import urllib.request
+
+from fetcher import Fetcher
+from benchmarks.stub_server import StubServer
+
+PAGE = "<html><body><div class='infobox'><div class='heading'>Mystic Coin</div></div></body></html>"
+
+
+async def blocking_lookups(base_url, lookups):
+    async def lookup(i):
+        # Same shape as the old requests.get(..., timeout=10) call in on_message.
+        with urllib.request.urlopen(f"{base_url}/wiki/Item_{i}", timeout=10) as response:
+            return response.read()
+
+    await asyncio.gather(*(lookup(i) for i in range(lookups)))
+
+
+async def async_lookups(base_url, lookups, limit_per_host):
+    async with Fetcher(limit_per_host=limit_per_host) as fetcher:
+        await asyncio.gather(*(fetcher.get_text(f"{base_url}/wiki/Item_{i}") for i in range(lookups)))
+
+
+async def main(lookups, latency, limit_per_host):
+    pages = {f"/wiki/Item_{i}": PAGE for i in range(lookups)}
+    async with StubServer(pages, latency=latency) as server:
+        start = time.perf_counter()
+        await asyncio.to_thread(asyncio.run, blocking_lookups(server.base_url, lookups))
+        blocking = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await async_lookups(server.base_url, lookups, limit_per_host)
+        pooled = time.perf_counter() - start
+
+    print(f"{lookups} concurrent lookups, {latency * 1000:.0f} ms injected latency per request")
+    print(f"  blocking requests in event loop: {blocking:.3f}s")
+    print(f"  pooled async Fetcher (limit_per_host={limit_per_host}): {pooled:.3f}s")
+    print(f"  speedup: {blocking / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark blocking vs pooled async page fetches.")
+    parser.add_argument("--lookups", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--limit-per-host", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.lookups, args.latency, args.limit_per_host))
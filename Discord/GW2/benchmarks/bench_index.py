@@ -0,0 +1,100 @@
+# bench_index.py
+#
+# Builds a wiki index of N synthetic item names plus the corpus items and
+# times opening it and exact, prefix and fuzzy lookups. Then runs bot lookups
+# for a typo and a disambiguation page against the stub server, with and
+# without the index, and counts the wiki requests each needed.
+# Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.bench_index --names 60000
+
+import argparse
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+
+from cache import TTLCache
+from benchmarks.fakes import FakeMessage, corpus_pages, make_bot
+from benchmarks.stub_server import StubServer
+from wiki_index import WikiIndex, write_index
+
+CORPUS_ITEMS = [("Mystic Coin", "Mystic_Coin", 19976), ("The Bifrost", "The_Bifrost", 30689),
+                ("Bifrost", "The_Bifrost", 30689)]
+QUERIES = [("mystic coin", "exact"), ("the bif", "prefix"), ("mystc coin", "fuzzy"), ("gift of fortun", "fuzzy")]
+
+
+def synthetic_names(count, seed=1):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))).title()
+             for _ in range(3000)] + ["of", "the"] * 100
+    names = set()
+    while len(names) < count:
+        names.add(" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))))
+    return sorted(names)
+
+
+def time_call(function, *args, rounds=200):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = function(*args)
+    return (time.perf_counter() - start) / rounds, result
+
+
+async def wiki_requests(index_path, item_name, latency):
+    async with StubServer(latency=latency) as server:
+        server.pages.update(corpus_pages(server.base_url))
+        bot = make_bot(server.base_url)
+        bot.item_cache = TTLCache(maxsize=0)
+        bot.wiki_index = WikiIndex(index_path)
+        await bot.fetcher.start()
+        try:
+            message = FakeMessage(bot.user, item_name)
+            start = time.perf_counter()
+            await bot.on_message(message)
+            await bot.scheduler.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            await bot.scheduler.stop()
+            await bot.fetcher.close()
+            bot.wiki_index.close()
+        reply = message.channel.sent[-1]
+        answer = reply.embed.title if reply.embed else reply.content
+        return sum(count for path, count in server.hits.items() if path.startswith("/wiki/")), elapsed, answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline wiki index.")
+    parser.add_argument("--names", type=int, default=60000)
+    parser.add_argument("--latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "items.idx")
+        entries = CORPUS_ITEMS + [("Gift of Fortune", "Gift_of_Fortune", 19626)] + \
+            [(name, name, 100000 + i) for i, name in enumerate(synthetic_names(args.names))]
+        start = time.perf_counter()
+        count = write_index(path, entries)
+        built = time.perf_counter() - start
+        print(f"{count} names, {os.path.getsize(path) / 1024 / 1024:.1f} MB on disk, built in {built:.2f}s")
+
+        opened, index = time_call(WikiIndex, path, rounds=20)
+        print(f"  open (mmap): {opened * 1000:8.3f} ms")
+        lookups = {"exact": index.get, "prefix": index.prefix, "fuzzy": index.fuzzy}
+        for query, kind in QUERIES:
+            seconds, result = time_call(lookups[kind], query)
+            best = result if kind == "exact" else result[0] if result else None
+            print(f"  {kind:>6} {query!r:18} {seconds * 1000:8.3f} ms  -> {best}")
+        index.close()
+
+        print(f"\nbot lookups, {args.latency * 1000:.0f} ms injected latency per request")
+        for item_name in ("Mystc Coin", "Bifrost"):
+            for label, index_path in (("no index", None), ("index", path)):
+                requests, elapsed, answer = asyncio.run(wiki_requests(index_path, item_name, args.latency))
+                print(f"  {item_name!r:13} {label:9} wiki requests={requests}  {elapsed:.3f}s  -> {answer}")
+
+
+if __name__ == "__main__":
+    main()
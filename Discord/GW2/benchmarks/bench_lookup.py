@@ -0,0 +1,56 @@
+# bench_lookup.py
+#
+# Runs full on_message lookups against the saved corpus served by a local stub
+# server and prints per-stage p50/p99 timings. GW2TP can be made slower than
+# the wiki to see the latency budget at work. Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.bench_lookup --lookups 50 --wiki-latency 0.15 --tp-latency 0.4 --budget 0.2
+
+import argparse
+import asyncio
+
+from cache import TTLCache
+from benchmarks.fakes import FakeMessage, corpus_pages, make_bot
+from benchmarks.stub_server import StubServer
+
+ITEMS = ["Mystic Coin", "Bifrost", "The Bifrost"]
+
+
+async def run(lookups, wiki_latency, tp_latency, budget, use_cache):
+    async with StubServer(latency=wiki_latency, route_latency={"/tp/": tp_latency}) as server:
+        server.pages.update(corpus_pages(server.base_url))
+        bot = make_bot(server.base_url)
+        bot.price_budget = budget
+        await bot.fetcher.start()
+        try:
+            for i in range(lookups):
+                if not use_cache:
+                    bot.item_cache = TTLCache(maxsize=0)
+                    bot.price_cache = TTLCache(maxsize=0)
+                await bot.on_message(FakeMessage(bot.user, ITEMS[i % len(ITEMS)]))
+                await bot.scheduler.join()
+            while bot.background_tasks:
+                await asyncio.gather(*bot.background_tasks)
+        finally:
+            await bot.scheduler.stop()
+            await bot.fetcher.close()
+        return bot.lookup_latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency of the bot's lookup pipeline.")
+    parser.add_argument("--lookups", type=int, default=30)
+    parser.add_argument("--wiki-latency", type=float, default=0.15)
+    parser.add_argument("--tp-latency", type=float, default=0.3)
+    parser.add_argument("--budget", type=float, default=0.2, help="price latency budget in seconds")
+    parser.add_argument("--cache", action="store_true", help="keep the item and price caches enabled")
+    args = parser.parse_args()
+
+    for label, budget in (("wait for prices", None), (f"budget {args.budget}s", args.budget)):
+        latency = asyncio.run(run(args.lookups, args.wiki_latency, args.tp_latency, budget, args.cache))
+        print(f"\n--- {label} ---")
+        print(latency.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# bench_shards.py
+#
+# Measures lookup throughput as the number of shard processes grows. A fake
+# gateway splits mentions across shards by guild id the way Discord does, and
+# every shard process runs a Bot against one stub upstream serving synthetic
+# item pages. With --shared-cache the shards share one sqlite cache, so an item
+# parsed by one shard is served from the cache by the others.
+# Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.bench_shards --workers 1 2 4 --lookups 2000 --items 400 --shared-cache
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_extract import add_chrome
+from benchmarks.fakes import CORPUS_DIR, FakeGuild, FakeMessage, FakeUser, make_bot
+from benchmarks.stub_server import StubServer
+from sharding import shard_for_guild
+
+
+def item_pages(base_url, items, chrome_kb):
+    """Copies of the saved Mystic Coin wiki and GW2TP pages, renamed to Item 0 .. Item N-1."""
+    with open(os.path.join(CORPUS_DIR, "Mystic_Coin.html"), encoding="utf-8") as f:
+        wiki_page = add_chrome(f.read(), chrome_kb).replace("https://www.gw2tp.com/item/", base_url + "/tp/")
+    with open(os.path.join(CORPUS_DIR, "gw2tp_19976-mystic-coin.html"), encoding="utf-8") as f:
+        tp_page = f.read()
+    pages = {}
+    for i in range(items):
+        item_id = str(50000 + i)
+        pages[f"/wiki/Item_{i}"] = wiki_page.replace("Mystic Coin", f"Item {i}").replace("19976", item_id)
+        pages[f"/tp/{item_id}-mystic-coin"] = tp_page
+    return pages
+
+
+def start_stub(items, chrome_kb, latency):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = StubServer(latency=latency)
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    server.pages.update(item_pages(server.base_url, items, chrome_kb))
+    return server, loop
+
+
+async def run_shard(base_url, mentions, barrier):
+    bot = make_bot(base_url)
+    await bot.fetcher.start()
+    try:
+        await asyncio.to_thread(barrier.wait)
+        start = time.perf_counter()
+        for user_id, guild_id, item in mentions:
+            await bot.on_message(FakeMessage(bot.user, item, author=FakeUser(user_id), guild=FakeGuild(guild_id)))
+        await bot.scheduler.join()
+        return time.perf_counter() - start
+    finally:
+        await bot.scheduler.stop()
+        await bot.fetcher.close()
+        if bot.parse_pool is not None:
+            bot.parse_pool.shutdown()
+        if bot.cache_store is not None:
+            bot.cache_store.close()
+
+
+def shard_process(base_url, mentions, barrier, results, env):
+    os.environ.update(env)
+    results.put(asyncio.run(run_shard(base_url, mentions, barrier)))
+
+
+def run(workers, lookups, items, base_url, cache_db, lookup_workers):
+    rng = random.Random(7)
+    mentions = [(3000 + rng.randrange(500), rng.randrange(1, 1 << 40) << 22, f"Item {rng.randrange(items)}")
+                for _ in range(lookups)]
+    by_shard = [[] for _ in range(workers)]
+    for mention in mentions:
+        by_shard[shard_for_guild(mention[1], workers)].append(mention)
+
+    env = {"LOOKUP_WORKERS": str(lookup_workers), "LOOKUP_QUEUE_SIZE": str(lookups),
+           "PRICE_LATENCY_BUDGET": "0", "PYTHONUNBUFFERED": "1"}
+    if cache_db:
+        env["CACHE_DB"] = cache_db
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=shard_process, args=(base_url, shard, barrier, results, env))
+                 for shard in by_shard]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    elapsed = [results.get() for _ in processes]
+    wall = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return wall, max(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookup throughput by number of shard processes.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--chrome-kb", type=int, default=150)
+    parser.add_argument("--lookup-workers", type=int, default=32, help="concurrent lookups per shard")
+    parser.add_argument("--shared-cache", action="store_true", help="share one sqlite cache between shards")
+    args = parser.parse_args()
+
+    server, loop = start_stub(args.items, args.chrome_kb, args.latency)
+    print(f"{args.lookups} mentions over {args.items} items, {args.latency * 1000:.0f} ms upstream latency, "
+          f"{'shared sqlite' if args.shared_cache else 'per-process'} cache")
+    baseline = None
+    try:
+        for workers in args.workers:
+            server.hits.clear()
+            with tempfile.TemporaryDirectory() as directory:
+                cache_db = os.path.join(directory, "cache.db") if args.shared_cache else None
+                wall, slowest = run(workers, args.lookups, args.items, server.base_url, cache_db,
+                                    args.lookup_workers)
+            throughput = args.lookups / wall
+            baseline = baseline or throughput
+            wiki_requests = sum(count for path, count in server.hits.items() if path.startswith("/wiki/"))
+            print(f"  {workers} shard(s): {throughput:8.1f} lookups/s  ({throughput / baseline:.2f}x)  "
+                  f"slowest shard {slowest:.2f}s  wiki requests={wiki_requests}")
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
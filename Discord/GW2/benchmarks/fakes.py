@@ -0,0 +1,109 @@
+# fakes.py
+#
+# Minimal stand-ins for the Discord objects on_message touches, plus helpers
+# that point a Bot at a StubServer serving the saved pages in corpus/.
+
+import json
+import os
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def corpus_pages(base_url):
+    """Map stub paths to the saved wiki and GW2TP pages, with GW2TP links rewritten to the stub."""
+    pages = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+            body = f.read().replace("https://www.gw2tp.com/item/", base_url + "/tp/")
+        name = filename.removesuffix(".html")
+        if name.startswith("gw2tp_"):
+            item_id = name.removeprefix("gw2tp_")
+            pages[f"/tp/{item_id}"] = body
+        else:
+            pages[f"/wiki/{name}"] = body
+    return pages
+
+
+class FakeUser:
+    def __init__(self, user_id, name="user"):
+        self.id = user_id
+        self.name = name
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeSentMessage:
+    def __init__(self, content=None, embed=None):
+        self.content = content
+        self.embed = embed
+        self.edits = 0
+
+    async def edit(self, content=None, embed=None):
+        self.content = content or self.content
+        self.embed = embed or self.embed
+        self.edits += 1
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        message = FakeSentMessage(content, embed)
+        self.sent.append(message)
+        return message
+
+
+class FakeMessage:
+    def __init__(self, bot_user, content, author=None, guild=None, channel=None):
+        self.author = author or FakeUser(1000)
+        self.guild = guild
+        self.mentions = [bot_user] if guild else []
+        self.content = f"<@{bot_user.id}> {content}" if guild else content
+        self.channel = channel or FakeChannel()
+
+
+def make_bot(base_url, use_api=False, rate_limits=False):
+    """Create a Bot that talks to the stub server instead of the real wiki.
+
+    With `use_api`, GW2 API requests go to the stub under /api. Per-user and
+    per-guild rate limits are off unless `rate_limits` is set, since the fake
+    messages mostly come from one user.
+    """
+    os.environ["WIKI_BASE"] = base_url
+    os.environ["GW2_API_BASE"] = base_url + "/api"
+    os.environ["USE_GW2_API"] = "1" if use_api else "0"
+    for name in ("USER_RATE", "GUILD_RATE"):
+        if rate_limits:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = "0"
+    from bot import Bot
+
+    bot = Bot()
+    bot._connection.user = FakeUser(1, "GW2_Item_Lookup")
+    return bot
+
+
+def api_routes(fixture_path=os.path.join(os.path.dirname(__file__), "api_fixture.json")):
+    """Stub routes that answer /v2/items and /v2/commerce/prices batches like the official API."""
+    with open(fixture_path, encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    def by_ids(entries):
+        entries = {entry["id"]: entry for entry in entries}
+
+        def route(query):
+            found = [entries[int(i)] for i in query.get("ids", "").split(",") if i and int(i) in entries]
+            return json.dumps(found) if found else None
+
+        return route
+
+    return {
+        "/api/v2/items": by_ids(fixture["items"]),
+        "/api/v2/commerce/prices": by_ids(fixture["prices"]),
+        "/api/v2/recipes/search": lambda query: "[]",
+    }
@@ -0,0 +1,58 @@
+# load_coalesce.py
+#
+# Fires N simultaneous mentions for the same item at a bot backed by the stub
+# server and checks that they share one wiki fetch and one GW2TP fetch, and
+# that every mention gets the same embed. Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.load_coalesce --mentions 50 --latency 0.2
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import FakeGuild, FakeMessage, FakeUser, corpus_pages, make_bot
+from benchmarks.stub_server import StubServer
+
+
+async def run(mentions, latency, item_name):
+    async with StubServer(latency=latency) as server:
+        server.pages.update(corpus_pages(server.base_url))
+        bot = make_bot(server.base_url)
+        bot.price_budget = None
+        await bot.fetcher.start()
+        try:
+            messages = [FakeMessage(bot.user, item_name, author=FakeUser(2000 + i), guild=FakeGuild(1))
+                        for i in range(mentions)]
+            start = time.perf_counter()
+            await asyncio.gather(*(bot.on_message(message) for message in messages))
+            await bot.scheduler.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            await bot.scheduler.stop()
+            await bot.fetcher.close()
+
+    wiki_fetches = sum(count for path, count in server.hits.items() if path.startswith("/wiki/"))
+    tp_fetches = sum(count for path, count in server.hits.items() if path.startswith("/tp/"))
+    embeds = [message.channel.sent[-1].embed.to_dict() for message in messages]
+    assert wiki_fetches == 1, f"expected one wiki fetch, got {wiki_fetches}: {dict(server.hits)}"
+    assert tp_fetches == 1, f"expected one GW2TP fetch, got {tp_fetches}: {dict(server.hits)}"
+    assert all(embed == embeds[0] for embed in embeds), "coalesced mentions received different embeds"
+
+    print(f"{mentions} simultaneous mentions of '{item_name}' answered in {elapsed:.3f}s")
+    print(f"  upstream requests: wiki={wiki_fetches} gw2tp={tp_fetches}")
+    for name, stats in bot.lookup_stats().items():
+        if name.endswith("flights"):
+            print(f"  {name}: started={stats['started']} coalesced={stats['coalesced']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for single-flight lookup coalescing.")
+    parser.add_argument("--mentions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--item", default="Mystic Coin")
+    args = parser.parse_args()
+    asyncio.run(run(args.mentions, args.latency, args.item))
+
+
+if __name__ == "__main__":
+    main()
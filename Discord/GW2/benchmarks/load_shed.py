@@ -0,0 +1,70 @@
+# load_shed.py
+#
+# Floods the bot with mentions from a few spammy users and many well-behaved
+# ones across several guilds, then reports how the scheduler admitted, limited
+# and shed them, how deep the queue got and how long accepted lookups waited.
+# Run from the Discord/GW2 directory:
+#
+#     python -m benchmarks.load_shed --mentions 300 --workers 4 --queue 50 --latency 0.1
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.fakes import FakeGuild, FakeMessage, FakeUser, corpus_pages, make_bot
+from benchmarks.stub_server import StubServer
+
+ITEMS = ["Mystic Coin", "Bifrost", "The Bifrost"]
+
+
+async def run(mentions, workers, queue_size, latency, spammers, interval):
+    os.environ["LOOKUP_WORKERS"] = str(workers)
+    os.environ["LOOKUP_QUEUE_SIZE"] = str(queue_size)
+    async with StubServer(latency=latency) as server:
+        server.pages.update(corpus_pages(server.base_url))
+        bot = make_bot(server.base_url, rate_limits=True)
+        # Caches off, so every accepted lookup reaches the stub upstreams.
+        bot.item_cache.maxsize = bot.price_cache.maxsize = 0
+        await bot.fetcher.start()
+        rng = random.Random(1)
+        guilds = [FakeGuild(10 + i) for i in range(4)]
+        max_depth = 0
+        try:
+            start = time.perf_counter()
+            for i in range(mentions):
+                # Half of the traffic comes from a handful of spammers.
+                user_id = 1000 + (rng.randrange(spammers) if i % 2 else spammers + i)
+                message = FakeMessage(bot.user, rng.choice(ITEMS), author=FakeUser(user_id), guild=rng.choice(guilds))
+                await bot.on_message(message)
+                max_depth = max(max_depth, bot.scheduler.queue.qsize())
+                await asyncio.sleep(interval)
+            await bot.scheduler.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            await bot.scheduler.stop()
+            await bot.fetcher.close()
+
+    stats = bot.scheduler.stats()
+    print(f"{mentions} mentions in {elapsed:.2f}s, {workers} workers, queue of {queue_size}")
+    print(f"  accepted={stats['accepted']} user_limited={stats['user_limited']} "
+          f"guild_limited={stats['guild_limited']} queue_full={stats['queue_full']}")
+    print(f"  max queue depth={max_depth}  wait p50={stats['wait_p50_ms']:.1f}ms p99={stats['wait_p99_ms']:.1f}ms")
+    print(f"  upstream requests={sum(server.hits.values())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load shedding behaviour of the lookup scheduler.")
+    parser.add_argument("--mentions", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--spammers", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between mentions")
+    args = parser.parse_args()
+    asyncio.run(run(args.mentions, args.workers, args.queue, args.latency, args.spammers, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# stub_server.py
+
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+
+
+class StubServer:
+    """Local HTTP server that serves canned pages after an injected delay.
+
+    `pages` maps request paths (including the query string, if any) to
+    response bodies. `routes` maps a path to a function that builds the body
+    from the query parameters, returning None for a 404. `route_latency`
+    overrides the delay for paths starting with a given prefix. Every request
+    is counted in `hits`, and response sizes in `bytes_sent`, so callers can
+    check how much upstream traffic a run produced.
+    """
+
+    def __init__(self, pages=None, latency=0.2, route_latency=None, routes=None, host="127.0.0.1", port=0):
+        self.pages = dict(pages or {})
+        self.routes = dict(routes or {})
+        self.latency = latency
+        self.route_latency = dict(route_latency or {})
+        self.host = host
+        self.port = port
+        self.hits = Counter()
+        self.bytes_sent = 0
+        self.runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def handle(self, request):
+        self.hits[request.path_qs] += 1
+        latency = next((delay for prefix, delay in self.route_latency.items() if request.path.startswith(prefix)),
+                       self.latency)
+        if latency:
+            await asyncio.sleep(latency)
+        if request.path in self.routes:
+            body = self.routes[request.path](request.query)
+        else:
+            body = self.pages.get(request.path_qs, self.pages.get(request.path))
+        if body is None:
+            return web.Response(status=404, text="There is currently no text in this page.")
+        self.bytes_sent += len(body.encode())
+        content_type = "application/json" if body.lstrip().startswith(("{", "[")) else "text/html"
+        return web.Response(text=body, content_type=content_type)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
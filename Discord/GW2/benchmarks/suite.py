@@ -0,0 +1,87 @@
+# suite.py
+#
+# The GW2 cases of the repository's benchmark suite: extraction and embed
+# building over the saved pages in corpus/, and whole lookups against those
+# pages served by a local stub server without latency, so only the bot's own
+# work is timed. They are timed, recorded and compared by bench_suite.py at
+# the repository root:
+#
+#     python bench_suite.py --project gw2
+
+import asyncio
+import atexit
+import os
+
+import extractor
+from benchmarks.bench_extract import WIKI_BASE, add_chrome
+from benchmarks.fakes import CORPUS_DIR, corpus_pages, make_bot
+from benchmarks.stub_server import StubServer
+from cache import TTLCache
+
+ITEMS = ["Mystic Coin", "Bifrost", "The Bifrost"]
+
+
+def read_corpus(chrome_kb):
+    wiki, tp = [], []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+            page = f.read()
+        name = filename.removesuffix(".html")
+        if name.startswith("gw2tp_"):
+            tp.append(page)
+        else:
+            wiki.append((name, add_chrome(page, chrome_kb)))
+    return wiki, tp
+
+
+def start_stub_bot(loop):
+    """A bot looking items up on a stub server without latency, with its item and price caches off."""
+    server = loop.run_until_complete(StubServer(latency=0).start())
+    server.pages.update(corpus_pages(server.base_url))
+    bot = make_bot(server.base_url)
+    bot.item_cache = TTLCache(maxsize=0)
+    bot.price_cache = TTLCache(maxsize=0)
+    loop.run_until_complete(bot.fetcher.start())
+
+    async def stop():
+        await bot.fetcher.close()
+        await server.stop()
+
+    atexit.register(lambda: loop.run_until_complete(stop()))
+    return bot
+
+
+def cases(workdir, quick=False):
+    """Name -> function to time. Everything the functions read is prepared here, outside the timings."""
+    wiki, tp = read_corpus(chrome_kb=150)
+
+    def extract_all(use_lxml):
+        return [extractor.extract_item_data(page, WIKI_BASE + "/wiki/" + name, name, WIKI_BASE, use_lxml=use_lxml)
+                for name, page in wiki]
+
+    loop = asyncio.new_event_loop()
+    bot = start_stub_bot(loop)
+    from bot import format_price  # only once make_bot has set the environment bot.py reads
+
+    raw_prices = extractor.extract_prices(tp[0])
+    prices = {"buy_price": format_price(raw_prices["buy"]), "sell_price": format_price(raw_prices["sell"])}
+    items = [({**item_data, **prices}, recipe_data) for item_data, recipe_data in extract_all(use_lxml=False)
+             if item_data]
+
+    async def lookup_all():
+        for name in ITEMS:
+            item_data, recipe_data, price_task = await bot.lookup_item(name)
+            if price_task is not None:
+                item_data.update(await price_task)
+            bot.create_item_embed(item_data, recipe_data)
+
+    timed = {
+        "extract_item_data.html_parser": lambda: extract_all(use_lxml=False),
+        "extract_prices.gw2tp": lambda: [extractor.extract_prices(page) for page in tp],
+        "create_item_embed": lambda: [bot.create_item_embed(item_data, recipe_data)
+                                      for item_data, recipe_data in items],
+        "lookup.stub": lambda: loop.run_until_complete(lookup_all()),
+    }
+    if extractor.lxml is not None:
+        timed["extract_item_data.lxml"] = lambda: extract_all(use_lxml=True)
+    return timed
@@ -1,24 +1,167 @@
 # bot.py
 
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import discord
-import requests
-from bs4 import BeautifulSoup
+import html
+import json
+import logging
 import os
+import time
 import re  # Import the regular expressions module
 from dotenv import load_dotenv
+from cache import SingleFlight, SqliteStore, TTLCache, item_url_key
+from extractor import Disambiguation, extract_item_data, extract_prices
+from fetcher import Fetcher, FetchError
+from gw2api import API_BASE, GW2Api, item_to_data
+from metrics import Metrics, dump_periodically, start_metrics_server
 from responses import responses
+from scheduler import ACCEPTED, LookupScheduler
+from timings import LatencyStats, StageTimer
+from wiki_index import WikiIndex
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
+GW2TP_LINK = re.compile(r'<a\s[^>]*href="([^"]+)"[^>]*>\s*GW2TP\s*</a>')
+API_ID = re.compile(r'<div[^>]*\bdata-id="(\d+)"|api\.guildwars2\.com/v2/items\?ids=(\d+)')
+
+
+def format_price(price_in_copper):
+    price = int(price_in_copper)
+    if price == 0: return None
+    gold, silver = divmod(price, 10000)
+    silver, copper = divmod(silver, 100)
+    parts = []
+    if gold > 0: parts.append(f"{gold}g")
+    if silver > 0: parts.append(f"{silver}s")
+    if copper > 0 or not parts: parts.append(f"{copper}c")
+    return " ".join(parts)
+
+
+def log_task_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        log.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+
+def find_tp_link(page):
+    match = GW2TP_LINK.search(page)
+    return html.unescape(match.group(1)) if match else None
+
+
+def find_api_id(page):
+    match = API_ID.search(page)
+    return (match.group(1) or match.group(2)) if match else None
+
+
+class LookupFailed(Exception):
+    def __init__(self, response):
+        super().__init__(response)
+        self.response = response
+
 
 class Bot(discord.Client):
-    def __init__(self):
+    def __init__(self, shard_id=None, shard_count=None):
         intents = discord.Intents.default()
         intents.messages = True
         intents.message_content = True
-        super().__init__(intents=intents)
-        self.wiki_url = "https://wiki.guildwars2.com/wiki/"
+        super().__init__(intents=intents, shard_id=shard_id, shard_count=shard_count)
+        self.wiki_base = os.getenv('WIKI_BASE', "https://wiki.guildwars2.com")
+        self.wiki_url = self.wiki_base + "/wiki/"
         self.TOKEN = os.getenv('DISCORD_TOKEN')
+        self.fetcher = Fetcher(limit_per_host=int(os.getenv('FETCH_LIMIT_PER_HOST', 8)))
+
+        # Items with a known API id are read from the official API instead of the wiki and GW2TP.
+        self.api = None
+        if os.getenv('USE_GW2_API', '1') != '0':
+            self.api = GW2Api(self.fetcher, base_url=os.getenv('GW2_API_BASE', API_BASE))
+
+        # Item names are resolved to wiki titles and API ids locally, before any request is made.
+        self.wiki_index = WikiIndex(os.getenv('ITEM_INDEX'))
+        self.index_refresh_interval = float(os.getenv('INDEX_REFRESH_HOURS', 24)) * 3600
+
+        # Page parsing is CPU-bound; with PARSE_PROCESSES it runs in a process pool instead of a thread.
+        parse_processes = int(os.getenv('PARSE_PROCESSES', 0))
+        self.parse_pool = ProcessPoolExecutor(parse_processes) if parse_processes else None
+
+        # Wiki fields rarely change, trading post prices do, so they are cached separately.
+        cache_db = os.getenv('CACHE_DB')
+        self.cache_store = SqliteStore(cache_db) if cache_db else None
+        self.item_cache = TTLCache(maxsize=int(os.getenv('ITEM_CACHE_SIZE', 512)),
+                                   ttl=float(os.getenv('ITEM_CACHE_TTL', 86400)),
+                                   store=self.cache_store, namespace="items")
+        self.price_cache = TTLCache(maxsize=int(os.getenv('PRICE_CACHE_SIZE', 512)),
+                                    ttl=float(os.getenv('PRICE_CACHE_TTL', 300)),
+                                    store=self.cache_store, namespace="prices")
+        # Recipes read from wiki pages, by API id, for items whose recipe the API lacks (Mystic Forge recipes).
+        self.recipe_cache = TTLCache(maxsize=int(os.getenv('RECIPE_CACHE_SIZE', 4096)),
+                                     ttl=float(os.getenv('RECIPE_CACHE_TTL', 30 * 86400)),
+                                     store=self.cache_store, namespace="recipes")
+        # Concurrent lookups of the same item or prices share one upstream fetch.
+        self.item_flights = SingleFlight()
+        self.price_flights = SingleFlight()
+
+        # How long the first reply may wait for trading post prices before it is sent without them.
+        self.price_budget = float(os.getenv('PRICE_LATENCY_BUDGET', 1.5))
+        self.lookup_latency = LatencyStats()
+        self.background_tasks = set()
+
+        # Lookups wait in a bounded queue; LOOKUP_WORKERS caps how many run against the upstreams at once.
+        self.scheduler = LookupScheduler(self.handle_lookup,
+                                         workers=int(os.getenv('LOOKUP_WORKERS', 4)),
+                                         max_queue=int(os.getenv('LOOKUP_QUEUE_SIZE', 100)),
+                                         user_rate=float(os.getenv('USER_RATE', 0.2)),
+                                         user_burst=int(os.getenv('USER_BURST', 3)),
+                                         guild_rate=float(os.getenv('GUILD_RATE', 2)),
+                                         guild_burst=int(os.getenv('GUILD_BURST', 20)))
+        # Users who are turned away hear about it at most once per window, so the replies are not spam themselves.
+        self.rejection_notices = TTLCache(maxsize=1024, ttl=float(os.getenv('REJECTION_NOTICE_WINDOW', 10)))
+
+        # Counters and stage histograms, served on METRICS_PORT and/or dumped to METRICS_DUMP_PATH.
+        self.metrics = Metrics()
+        self.metrics.add_collector("lookup", self.lookup_stats)
+        self.metrics.add_collector("upstream", self.fetcher.stats)
+        self.metrics_runner = None
+
+    async def setup_hook(self):
+        await self.fetcher.start()
+        if os.getenv('METRICS_PORT'):
+            self.metrics_runner = await start_metrics_server(self.metrics, os.getenv('METRICS_HOST', '127.0.0.1'),
+                                                             int(os.getenv('METRICS_PORT')) + (self.shard_id or 0))
+        if os.getenv('METRICS_DUMP_PATH'):
+            path = os.getenv('METRICS_DUMP_PATH')
+            if self.shard_id is not None:
+                path = f"{path}.shard{self.shard_id}"
+            self.spawn_background(dump_periodically(self.metrics, path,
+                                                    float(os.getenv('METRICS_DUMP_INTERVAL', 60))))
+        if self.wiki_index.path:
+            # In a sharded deployment only the first shard rebuilds the shared index; the others reload it.
+            if self.api is not None and not self.shard_id:
+                self.spawn_background(self.refresh_index_periodically())
+            else:
+                self.spawn_background(self.follow_index_file())
+
+    def spawn_background(self, coro):
+        """Run `coro` as a task nobody awaits, holding a reference to it and logging how it failed, if it did."""
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        task.add_done_callback(log_task_failure)
+        return task
+
+    async def close(self):
+        await self.scheduler.stop()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        self.wiki_index.save()
+        await self.fetcher.close()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(cancel_futures=True)
+        if self.cache_store is not None:
+            self.cache_store.close()
+        await super().close()
 
     async def on_ready(self):
         print(f"Logged in as {self.user.name} ({self.user.id})")
@@ -41,147 +184,276 @@ class Bot(discord.Client):
             await message.channel.send(responses["item_not_provided"])
             return
 
-        item_url = self.wiki_url + item_name.replace(" ", "_").title()
-
+        timer = StageTimer()
+        outcome = self.scheduler.submit(message.author.id, message.guild.id if message.guild else None,
+                                        message, item_name, timer)
+        if outcome != ACCEPTED:
+            self.metrics.inc("lookups_rejected_total", reason=outcome)
+        if outcome != ACCEPTED and self.rejection_notices.get(message.author.id) is None:
+            self.rejection_notices.set(message.author.id, outcome)
+            await message.channel.send(responses[outcome])
+
+    async def handle_lookup(self, message, item_name, timer):
+        timer.mark("queue_wait")
         try:
-            response = requests.get(item_url, timeout=10)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            print(f"Error fetching URL {item_url}: {e}")
-            await message.channel.send(responses["wiki_connection_failed"])
-            return
-
-        if "There is currently no text in this page." in response.text:
-            await message.channel.send(responses["item_not_found_on_wiki"].format(item_name=item_name))
+            item_data, recipe_data, price_task = await self.lookup_item(item_name, timer)
+        except LookupFailed as e:
+            self.metrics.inc("lookups_total", outcome="failed")
+            await message.channel.send(e.response)
             return
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        disambig_div = soup.select_one("div.disambig, #disambigbox")
-        if disambig_div:
-            print(f"Disambiguation page found for '{item_name}'. Trying to find the primary link.")
-            first_link = soup.select_one("#mw-content-text .mw-parser-output > ul > li > a")
-            if first_link and first_link.has_attr('href'):
-                new_url = "https://wiki.guildwars2.com" + first_link['href']
-                print(f"Following link to: {new_url}")
-                try:
-                    response = requests.get(new_url, timeout=10)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.content, "html.parser")
-                    item_url = new_url
-                except requests.RequestException as e:
-                    print(f"Error fetching disambiguation link {new_url}: {e}")
-                    await message.channel.send(responses["wiki_connection_failed"])
-                    return
+        self.metrics.inc("lookups_total", outcome="ok")
+
+        # Wait for prices only as long as the latency budget allows; late prices are edited in.
+        prices_pending = False
+        if price_task is not None:
+            with timer.stage("price_wait"):
+                done, _ = await asyncio.wait({price_task}, timeout=self.price_budget)
+            if done:
+                item_data.update(price_task.result())
             else:
-                await message.channel.send(
-                    f"I found a disambiguation page for `{item_name}`, but couldn't determine the correct item page.")
-                return
-
-        item_data, recipe_data = self.extract_item_data(soup, item_url, item_name)
-
-        if not item_data:
-            await message.channel.send(responses["infobox_not_found"].format(item_name=item_name))
-            return
+                prices_pending = True
+                self.metrics.inc("price_budget_exceeded_total")
 
-        embed = self.create_item_embed(item_data, recipe_data)
-        await message.channel.send(embed=embed)
+        with timer.stage("embed_build"):
+            embed = self.create_item_embed(item_data, recipe_data)
+        with timer.stage("send"):
+            sent = await message.channel.send(embed=embed)
+        timer.mark("first_response")
 
-    def extract_item_data(self, soup, item_url, item_name):
-        infobox = soup.select_one("div.infobox")
-        if not infobox:
-            return None, None
-
-        item_data = {"wiki_url": item_url}
-        recipe_data = {}
+        if prices_pending:
+            self.spawn_background(self.edit_in_prices(sent, item_data, recipe_data, price_task, timer))
+        else:
+            self.record_timings(item_name, timer)
 
-        def get_field(field_name):
+    async def edit_in_prices(self, sent, item_data, recipe_data, price_task, timer):
+        prices = await price_task
+        if prices:
+            item_data.update(prices)
             try:
-                return infobox.find("dt",
-                                    string=lambda t: t and t.strip().lower() == field_name.lower()).find_next_sibling(
-                    "dd").text.strip()
-            except AttributeError:
-                return None
-
-        item_data['name'] = infobox.select_one(".heading").text.strip() if infobox.select_one(".heading") else item_name
-
+                await sent.edit(embed=self.create_item_embed(item_data, recipe_data))
+            except discord.HTTPException as e:
+                # Usually the reply was deleted before the prices arrived.
+                log.info("Could not edit prices into the reply for '%s': %s", item_data.get('name'), e)
+        timer.mark("prices_edited")
+        self.record_timings(item_data.get('name'), timer)
+
+    def record_timings(self, item_name, timer):
+        self.lookup_latency.record(timer)
+        self.metrics.record(timer)
+        log.info("lookup %s", json.dumps({"item": item_name, "shard": self.shard_id,
+                                           "stages_ms": {name: round(seconds * 1000, 1)
+                                                         for name, seconds in timer.stages.items()}}))
+
+    async def refresh_index_periodically(self):
+        path = self.wiki_index.path
+        age = time.time() - os.path.getmtime(path) if os.path.exists(path) else None
+        if age is not None and age < self.index_refresh_interval:
+            await asyncio.sleep(self.index_refresh_interval - age)
+        while True:
+            try:
+                await self.refresh_index()
+            except FetchError as e:
+                log.warning("Could not refresh the item index: %s", e)
+            await asyncio.sleep(self.index_refresh_interval)
+
+    async def follow_index_file(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            if self.wiki_index.reload_if_changed():
+                log.info("Item index reloaded with %d names.", len(self.wiki_index))
+
+    async def refresh_index(self):
+        entries = []
+        async for page in self.api.iter_item_pages():
+            entries.extend((item["name"], item["name"], item["id"]) for item in page)
+        count = await self.wiki_index.refresh(entries)
+        log.info("Item index refreshed with %d names.", count)
+
+    def lookup_stats(self):
+        return {
+            "item_cache": self.item_cache.stats(),
+            "price_cache": self.price_cache.stats(),
+            "recipe_cache": self.recipe_cache.stats(),
+            "item_flights": self.item_flights.stats(),
+            "price_flights": self.price_flights.stats(),
+            "scheduler": self.scheduler.stats(),
+            "index_names": len(self.wiki_index),
+            **({"cache_store_skipped_writes": self.cache_store.skipped_writes} if self.cache_store else {}),
+            **({"api_items": self.api.items.stats(), "api_prices": self.api.prices.stats()} if self.api else {}),
+        }
+
+    async def lookup_item(self, item_name, timer=None):
+        timer = timer or StageTimer()
+        entry = self.wiki_index.resolve(item_name)
+        if entry is not None:
+            item_url = self.wiki_url + entry.title
+        else:
+            item_url = self.wiki_url + item_name.replace(" ", "_").title()
+        cache_key = item_url_key(item_url)
+
+        cached = self.item_cache.get(cache_key)
+        if cached is not None:
+            self.metrics.inc("item_source_total", source="cache")
+            item_data, recipe_data = cached
+            price_task = self.start_price_fetch(item_data.get('api_id'), item_data.get('tp_url'), timer)
+        else:
+            item_data, recipe_data, price_task = await self.item_flights.run(
+                cache_key, self.resolve_item, item_url, item_name, entry and entry.api_id, cache_key, timer)
+
+        # Cached and coalesced entries are shared, so prices go into a copy.
+        return dict(item_data), recipe_data, price_task
+
+    async def resolve_item(self, item_url, item_name, item_id, cache_key, timer):
+        fetched = None
+        if self.api is not None and item_id:
+            fetched = await self.fetch_item_api(item_id, item_url, item_name, timer)
+        if fetched is not None:
+            self.metrics.inc("item_source_total", source="api")
+        else:
+            fetched = await self.fetch_item_page(item_url, item_name, timer)
+            self.metrics.inc("item_source_total", source="wiki")
+            if fetched[1] and fetched[0].get('api_id'):
+                self.recipe_cache.set(fetched[0]['api_id'], fetched[1])
+            # Remember where the name led, so the next lookup skips guessing and disambiguation pages.
+            title = fetched[0]['wiki_url'].removeprefix(self.wiki_url)
+            self.wiki_index.learn(item_name, title, fetched[0].get('api_id'))
+            self.wiki_index.learn(fetched[0]['name'], title, fetched[0].get('api_id'))
+        item_data, recipe_data, price_task = fetched
+        self.item_cache.set(cache_key, [item_data, recipe_data])
+        resolved_key = item_url_key(item_data['wiki_url'])
+        if resolved_key != cache_key:
+            self.item_cache.set(resolved_key, [item_data, recipe_data])
+        return fetched
+
+    async def fetch_item_api(self, item_id, item_url, item_name, timer):
+        price_task = self.start_price_fetch(item_id, None, timer)
+        with timer.stage("api_fetch"):
+            item, recipe_data = await asyncio.gather(self.api.get_item(item_id), self.api.get_recipe(item_id),
+                                                     return_exceptions=True)
+        if isinstance(item, Exception) or item is None:
+            if price_task is not None:
+                price_task.cancel()
+            self.metrics.inc("api_fallbacks_total")
+            log.warning("API lookup for '%s' (%s) failed, falling back to the wiki: %s", item_name, item_id, item)
+            return None
+        if isinstance(recipe_data, Exception):
+            log.warning("Could not fetch recipe for %s: %s", item_id, recipe_data)
+            recipe_data = {}
+        item_data = item_to_data(item, item_url)
+        if not recipe_data:
+            recipe_data = self.recipe_cache.get(item_data['api_id']) or {}
+            if recipe_data:
+                item_data['source'] = "API and Wiki"
+        return item_data, recipe_data, price_task
+
+    async def fetch_item_page(self, item_url, item_name, timer):
+        with timer.stage("wiki_fetch"):
+            page = await self.get_wiki_page(item_url)
+
+        if page is None or "There is currently no text in this page." in page:
+            raise LookupFailed(self.not_found_response(item_name))
+
+        # The GW2TP link can be read from the raw HTML, so the price request runs while the page is parsed.
+        price_task = self.start_price_fetch(find_api_id(page), find_tp_link(page), timer)
         try:
-            icon_tag = infobox.select_one(".infobox-icon img")
-            if icon_tag and icon_tag.has_attr('src'):
-                item_data["icon_url"] = f"https://wiki.guildwars2.com{icon_tag['src']}"
-        except AttributeError:
-            pass
+            with timer.stage("parse"):
+                item_data, recipe_data = await self.parse_page(page, item_url, item_name, follow_disambiguation=True)
+        except Disambiguation as disambiguation:
+            if price_task is not None:
+                price_task.cancel()
+            self.metrics.inc("disambiguations_total")
+            log.info("Disambiguation page found for '%s'. Trying to find the primary link.", item_name)
+            if not disambiguation.href:
+                raise LookupFailed(responses["disambiguation_unresolved"].format(item_name=item_name))
+            item_url = self.wiki_base + disambiguation.href
+            log.info("Following link to: %s", item_url)
+            with timer.stage("disambig_fetch"):
+                page = await self.get_wiki_page(item_url)
+            if page is None:
+                raise LookupFailed(responses["disambiguation_unresolved"].format(item_name=item_name))
+            price_task = self.start_price_fetch(find_api_id(page), find_tp_link(page), timer)
+            with timer.stage("parse"):
+                item_data, recipe_data = await self.parse_page(page, item_url, item_name)
 
+        if not item_data:
+            if price_task is not None:
+                price_task.cancel()
+            raise LookupFailed(responses["infobox_not_found"].format(item_name=item_name))
+        return item_data, recipe_data, price_task
+
+    def not_found_response(self, item_name):
+        suggestions = [entry.title.replace("_", " ") for score, entry in self.wiki_index.fuzzy(item_name, limit=3)
+                       if score >= 0.6]
+        if suggestions:
+            return responses["item_not_found_suggestions"].format(
+                item_name=item_name, suggestions=", ".join(f"`{title}`" for title in suggestions))
+        return responses["item_not_found_on_wiki"].format(item_name=item_name)
+
+    async def get_wiki_page(self, url):
+        """Return the page HTML, or None when the wiki has no page at `url`."""
         try:
-            description_paragraph = soup.select_one("#mw-content-text .mw-parser-output > p")
-            description_text = description_paragraph.text.strip()
-            unwanted_suffix = "— In-game description"
-            item_data["description"] = description_text.removesuffix(unwanted_suffix).strip()
-        except AttributeError:
-            item_data["description"] = "No description available."
-
-        rarity_text = get_field("Rarity")
-        if rarity_text and len(rarity_text) > 1:
-            item_data['rarity'] = rarity_text[1:]
-        else:
-            item_data['rarity'] = rarity_text
-
-        item_data['type'] = get_field("Item type") or get_field("Type")
-        item_data['req_level'] = get_field("Req. level")
-        item_data['binding'] = get_field("Binding")
-
-        if infobox and infobox.has_attr('data-id'):
-            item_data['api_id'] = infobox['data-id']
-        else:
+            return await self.fetcher.get_text(url)
+        except FetchError as e:
+            if e.status == 404:
+                return None
+            log.warning("Error fetching URL %s: %s", url, e)
+            raise LookupFailed(responses["wiki_connection_failed"])
+
+    def start_price_fetch(self, api_id, tp_url, timer):
+        if self.api is None:
+            api_id = None
+        if not api_id and not tp_url:
+            return None
+        return asyncio.create_task(self.timed_fetch_prices(api_id, tp_url, timer))
+
+    async def timed_fetch_prices(self, api_id, tp_url, timer):
+        with timer.stage("price_fetch"):
+            return await self.fetch_prices(api_id, tp_url)
+
+    async def fetch_prices(self, api_id, tp_url):
+        cache_key = f"api:{api_id}" if api_id else tp_url
+        prices = self.price_cache.get(cache_key)
+        if prices is not None:
+            return prices
+        return await self.price_flights.run(cache_key, self.load_prices, api_id, tp_url, cache_key)
+
+    async def load_prices(self, api_id, tp_url, cache_key):
+        if api_id:
             try:
-                api_link = soup.find('a', href=re.compile(r'api\.guildwars2\.com/v2/items\?ids='))
-                item_id_str = api_link['href'].split('ids=')[1].split('&')[0]
-                item_data['api_id'] = item_id_str
-            except AttributeError:
-                print(f"No API ID found for {item_name}")
-
-        if item_data.get('api_id'):
-            print(f"Found API ID: {item_data['api_id']}")
+                listing = await self.api.get_price(api_id)
+                # No listing means the item cannot be traded; that is cached like any other answer.
+                prices = {}
+                if listing:
+                    prices = {'buy_price': format_price(listing['buys']['unit_price']),
+                              'sell_price': format_price(listing['sells']['unit_price']),
+                              'price_source': "the GW2 API"}
+            except Exception as e:
+                # Unreachable or malformed listings leave the reply without prices.
+                log.warning("Could not fetch API prices for %s: %s", api_id, e)
+            else:
+                self.price_cache.set(cache_key, prices)
+                return prices
+        if not tp_url:
+            return {}
 
         try:
-            gw2tp_link = soup.find("a", string="GW2TP")
-            if gw2tp_link:
-                tp_url = gw2tp_link['href']
-                tp_response = requests.get(tp_url, timeout=10)
-                tp_soup = BeautifulSoup(tp_response.content, "html.parser")
-                buy_price_raw = tp_soup.select_one("#buy-price").get('data-price', 0)
-                sell_price_raw = tp_soup.select_one("#sell-price").get('data-price', 0)
-
-                def format_price(price_in_copper):
-                    price = int(price_in_copper)
-                    if price == 0: return None
-                    gold, silver = divmod(price, 10000)
-                    silver, copper = divmod(silver, 100)
-                    parts = []
-                    if gold > 0: parts.append(f"{gold}g")
-                    if silver > 0: parts.append(f"{silver}s")
-                    if copper > 0 or not parts: parts.append(f"{copper}c")
-                    return " ".join(parts)
-
-                item_data['buy_price'] = format_price(buy_price_raw)
-                item_data['sell_price'] = format_price(sell_price_raw)
+            tp_page = await self.fetcher.get_text(tp_url)
+            raw_prices = extract_prices(tp_page)
+            prices = {'buy_price': format_price(raw_prices['buy']), 'sell_price': format_price(raw_prices['sell']),
+                      'price_source': "GW2TP"}
         except Exception as e:
-            print(f"Could not fetch trading post prices: {e}")
+            log.warning("Could not fetch trading post prices: %s", e)
+            return {}
 
-        recipe_box = soup.find('div', {'class': 'recipe-box'})
-        if recipe_box:
-            try:
-                recipe_data["output_qty"] = recipe_box.find('dt', string='Output qty.').find_next_sibling(
-                    'dd').text.strip()
-                ingredients_section = recipe_box.find('div', {'class': 'ingredients'})
-                if ingredients_section:
-                    ingredients = ingredients_section.find_all('dd')
-                    recipe_data["ingredients_list"] = [
-                        f"{ing.find_previous_sibling('dt').text.strip()} {ing.text.strip()}" for ing in ingredients]
-            except AttributeError:
-                pass
-
-        return item_data, recipe_data
+        self.price_cache.set(cache_key, prices)
+        return prices
+
+    async def parse_page(self, page, item_url, item_name, follow_disambiguation=False):
+        # Runs off the event loop: in the process pool when configured, else in the default thread pool.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_pool, partial(extract_item_data, page, item_url, item_name,
+                                                                   self.wiki_base,
+                                                                   follow_disambiguation=follow_disambiguation))
 
     def create_item_embed(self, item_data, recipe_data):
         description_text = item_data.get('description') or "No description available."
@@ -222,5 +494,8 @@ class Bot(discord.Client):
                 inline=False
             )
 
-        embed.set_footer(text="Data from the official Guild Wars 2 Wiki. Prices from GW2TP.")
+        footer = f"Data from the official Guild Wars 2 {item_data.get('source', 'Wiki')}."
+        if item_data.get('price_source') and (item_data.get('sell_price') or item_data.get('buy_price')):
+            footer += f" Prices from {item_data['price_source']}."
+        embed.set_footer(text=footer)
         return embed
\ No newline at end of file
@@ -0,0 +1,184 @@
+# cache.py
+
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote
+
+log = logging.getLogger(__name__)
+
+
+def item_url_key(url):
+    """Normalize a wiki URL so that spelling variants share one cache entry."""
+    url = unquote(url).strip()
+    url = re.sub(r"[\s_]+", "_", url)
+    return url.strip("_").lower()
+
+
+class SqliteStore:
+    """On-disk cache tier that survives restarts. Values must be JSON-serializable.
+
+    Several shard processes may write to the same file. Writes run on the
+    event loop, so they wait at most `busy_timeout` seconds per attempt for
+    another process's lock, and are skipped after `write_attempts`; the
+    entry is then only cached in memory.
+    """
+
+    def __init__(self, path, busy_timeout=0.05, write_attempts=3):
+        self.path = path
+        self.write_attempts = write_attempts
+        self.skipped_writes = 0
+        self.lock = threading.Lock()
+        # Setting up the file may wait longer, since shards started together all do it at once.
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                          "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                          "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))")
+        self.conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    def write(self, sql, params=()):
+        for attempt in range(self.write_attempts):
+            try:
+                with self.lock:
+                    self.conn.execute(sql, params)
+                return True
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+        self.skipped_writes += 1
+        log.warning("Skipped a write to the cache in %s: the database stayed locked", self.path)
+        return False
+
+    def get(self, namespace, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                                    (namespace, key)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            self.delete(namespace, key)
+            return None
+        return json.loads(value), expires_at
+
+    def set(self, namespace, key, value, expires_at):
+        self.write("INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                   (namespace, key, json.dumps(value), expires_at))
+
+    def delete(self, namespace, key):
+        self.write("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def purge_expired(self):
+        self.write("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class TTLCache:
+    """Bounded in-memory LRU cache with a per-entry time to live.
+
+    When a `store` is given, misses fall through to it and writes go to both
+    tiers, so entries outlive the process.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, store=None, namespace="default"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.namespace = namespace
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+
+        if self.store is not None:
+            stored = self.store.get(self.namespace, key)
+            if stored is not None:
+                self._put(key, *stored)
+                self.hits += 1
+                return stored[0]
+
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._put(key, value, expires_at)
+        if self.store is not None:
+            self.store.set(self.namespace, key, value, expires_at)
+
+    def _put(self, key, value, expires_at):
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight call.
+
+    The first caller for a key starts the call; everyone who asks for the same
+    key before it finishes awaits the same result (or exception) instead of
+    starting their own.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, function, *args):
+        task = self.calls.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(function(*args))
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self.calls.pop(key, None) if self.calls.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        # One caller giving up must not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def stats(self):
+        requests = self.started + self.coalesced
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / requests if requests else 0.0,
+        }
@@ -0,0 +1,212 @@
+# extractor.py
+
+import logging
+import re
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional, BeautifulSoup's html.parser is used without it
+    lxml = None
+
+from bs4 import BeautifulSoup
+
+log = logging.getLogger(__name__)
+
+API_LINK = re.compile(r'api\.guildwars2\.com/v2/items\?ids=')
+PRICE_TAG = r'<[^>]*\bid="{}"[^>]*>'
+DATA_PRICE = re.compile(r'\bdata-price="(\d*)"')
+UNWANTED_SUFFIX = "— In-game description"
+
+# Everything the bot reads lives inside the article body. Navigation, scripts
+# and the footer that follow it are skipped before the page is parsed.
+CONTENT_START = re.compile(r'<div[^>]*\bid="mw-content-text"')
+CONTENT_END = re.compile(r'<div[^>]*\b(?:class="printfooter"|id="catlinks")')
+
+
+class Disambiguation(Exception):
+    def __init__(self, href):
+        super().__init__(href)
+        self.href = href
+
+
+def content_region(page):
+    start = CONTENT_START.search(page)
+    if not start:
+        return page
+    end = CONTENT_END.search(page, start.end())
+    return page[start.start():end.start() if end else len(page)]
+
+
+def has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def only_string(element):
+    """The element's text when it is all it holds, directly or through single nested elements.
+
+    This is what BeautifulSoup's .string returns, so both scanners accept
+    the same labels, including linked ones like <dt><a>Rarity</a></dt>.
+    """
+    while len(element):
+        if len(element) > 1 or element.text or element[0].tail:
+            return None
+        element = element[0]
+    return element.text
+
+
+def scan_with_lxml(region, follow_disambiguation):
+    root = lxml.html.fromstring(region)
+    parser_output = root.xpath(f"descendant-or-self::*[@id='mw-content-text']//*[{has_class('mw-parser-output')}]")
+    if follow_disambiguation and root.xpath(f"//div[{has_class('disambig')}] | //*[@id='disambigbox']"):
+        links = [a for node in parser_output for a in node.xpath("./ul/li/a[@href]")]
+        raise Disambiguation(links[0].get("href") if links else None)
+
+    infoboxes = root.xpath(f"//div[{has_class('infobox')}]")
+    if not infoboxes:
+        return None
+    infobox = infoboxes[0]
+    scan = {"data_id": infobox.get("data-id")}
+
+    heading = infobox.xpath(f".//*[{has_class('heading')}]")
+    scan["heading"] = heading[0].text_content().strip() if heading else None
+    icon = infobox.xpath(f".//*[{has_class('infobox-icon')}]//img[@src]")
+    scan["icon_src"] = icon[0].get("src") if icon else None
+    paragraphs = [p for node in parser_output for p in node.xpath("./p")]
+    scan["description"] = paragraphs[0].text_content().strip() if paragraphs else None
+
+    # One pass over the infobox builds the whole dt -> dd map; the first dt of a given name wins.
+    fields = {}
+    for dt in infobox.iter("dt"):
+        label = only_string(dt)
+        if label is None:
+            continue
+        dd = dt.xpath("following-sibling::dd[1]")
+        if dd:
+            fields.setdefault(label.strip().lower(), dd[0].text_content().strip())
+    scan["fields"] = fields
+
+    api_links = [a.get("href") for a in root.iter("a") if API_LINK.search(a.get("href") or "")]
+    scan["api_href"] = api_links[0] if api_links else None
+    tp_links = [a for a in root.iter("a") if only_string(a) == "GW2TP"]
+    scan["tp_href"] = tp_links[0].get("href") if tp_links else None
+
+    recipe_boxes = root.xpath(f"//div[{has_class('recipe-box')}]")
+    scan["recipe"] = None
+    if recipe_boxes:
+        labels = [dt for dt in recipe_boxes[0].iter("dt") if only_string(dt) == "Output qty."]
+        output_qty = labels[0].xpath("following-sibling::dd[1]") if labels else []
+        if output_qty:
+            recipe = {"output_qty": output_qty[0].text_content().strip()}
+            ingredients = recipe_boxes[0].xpath(f".//div[{has_class('ingredients')}]")
+            if ingredients:
+                recipe["ingredients_list"] = [
+                    f"{dd.xpath('preceding-sibling::dt[1]')[0].text_content().strip()} {dd.text_content().strip()}"
+                    for dd in ingredients[0].iter("dd")]
+            scan["recipe"] = recipe
+    return scan
+
+
+def scan_with_soup(region, follow_disambiguation):
+    soup = BeautifulSoup(region, "html.parser")
+    if follow_disambiguation and soup.select_one("div.disambig, #disambigbox"):
+        first_link = soup.select_one("#mw-content-text .mw-parser-output > ul > li > a")
+        raise Disambiguation(first_link['href'] if first_link and first_link.has_attr('href') else None)
+
+    infobox = soup.select_one("div.infobox")
+    if not infobox:
+        return None
+    scan = {"data_id": infobox.get("data-id")}
+
+    heading = infobox.select_one(".heading")
+    scan["heading"] = heading.text.strip() if heading else None
+    icon = infobox.select_one(".infobox-icon img")
+    scan["icon_src"] = icon.get("src") if icon else None
+    description = soup.select_one("#mw-content-text .mw-parser-output > p")
+    scan["description"] = description.text.strip() if description else None
+
+    fields = {}
+    for dt in infobox.find_all("dt"):
+        if dt.string is None:
+            continue
+        dd = dt.find_next_sibling("dd")
+        if dd:
+            fields.setdefault(dt.string.strip().lower(), dd.text.strip())
+    scan["fields"] = fields
+
+    api_link = soup.find('a', href=API_LINK)
+    scan["api_href"] = api_link['href'] if api_link else None
+    tp_link = soup.find("a", string="GW2TP")
+    scan["tp_href"] = tp_link.get('href') if tp_link else None
+
+    recipe_box = soup.find('div', {'class': 'recipe-box'})
+    scan["recipe"] = None
+    if recipe_box:
+        output_qty = recipe_box.find('dt', string='Output qty.')
+        output_qty = output_qty.find_next_sibling('dd') if output_qty else None
+        if output_qty:
+            recipe = {"output_qty": output_qty.text.strip()}
+            ingredients_section = recipe_box.find('div', {'class': 'ingredients'})
+            if ingredients_section:
+                recipe["ingredients_list"] = [
+                    f"{ing.find_previous_sibling('dt').text.strip()} {ing.text.strip()}"
+                    for ing in ingredients_section.find_all('dd')]
+            scan["recipe"] = recipe
+    return scan
+
+
+def extract_item_data(page, item_url, item_name, wiki_base, follow_disambiguation=False, use_lxml=True):
+    """Turn a wiki page into the bot's (item_data, recipe_data) pair.
+
+    Raises Disambiguation with the first listed link when
+    `follow_disambiguation` is set and the page is a disambiguation page.
+    Returns (None, None) when the page has no item infobox.
+    """
+    region = content_region(page)
+    if use_lxml and lxml is not None:
+        scan = scan_with_lxml(region, follow_disambiguation)
+    else:
+        scan = scan_with_soup(region, follow_disambiguation)
+    if scan is None:
+        return None, None
+
+    fields = scan["fields"]
+    item_data = {"wiki_url": item_url, "name": scan["heading"] or item_name}
+    if scan["icon_src"]:
+        item_data["icon_url"] = f"{wiki_base}{scan['icon_src']}"
+    if scan["description"] is not None:
+        item_data["description"] = scan["description"].removesuffix(UNWANTED_SUFFIX).strip()
+    else:
+        item_data["description"] = "No description available."
+
+    rarity_text = fields.get("rarity")
+    item_data['rarity'] = rarity_text[1:] if rarity_text and len(rarity_text) > 1 else rarity_text
+    item_data['type'] = fields.get("item type") or fields.get("type")
+    item_data['req_level'] = fields.get("req. level")
+    item_data['binding'] = fields.get("binding")
+
+    if scan["data_id"]:
+        item_data['api_id'] = scan["data_id"]
+    elif scan["api_href"]:
+        item_data['api_id'] = scan["api_href"].split('ids=')[1].split('&')[0]
+    else:
+        log.debug("No API ID found for %s", item_name)
+
+    if item_data.get('api_id'):
+        log.debug("Found API ID: %s", item_data['api_id'])
+
+    if scan["tp_href"]:
+        item_data['tp_url'] = scan["tp_href"]
+
+    return item_data, scan["recipe"] or {}
+
+
+def extract_prices(page):
+    """Read the raw copper values of the `#buy-price` and `#sell-price` tags of a GW2TP page."""
+    prices = {}
+    for key, element_id in (("buy", "buy-price"), ("sell", "sell-price")):
+        tag = re.search(PRICE_TAG.format(element_id), page)
+        if tag is None:
+            raise ValueError(f"#{element_id} not found on GW2TP page")
+        value = DATA_PRICE.search(tag.group(0))
+        prices[key] = value.group(1) if value and value.group(1) else 0
+    return prices
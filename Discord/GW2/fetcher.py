@@ -0,0 +1,88 @@
+# fetcher.py
+
+import asyncio
+from collections import Counter
+
+import aiohttp
+
+
+class FetchError(Exception):
+    """Raised when an upstream page could not be fetched.
+
+    `status` is the HTTP status code when the upstream answered with an error.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class Fetcher:
+    """Pooled keep-alive HTTP session that lives as long as the bot.
+
+    `limit_per_host` caps concurrent requests per upstream; extra requests
+    wait for a free connection instead of blocking the event loop.
+    """
+
+    def __init__(self, timeout=10, limit=64, limit_per_host=8, user_agent="GW2WikiBot/1.0"):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.headers = {"User-Agent": user_agent}
+        self.session = None
+        self.requests = 0
+        self.errors = Counter()
+
+    async def start(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             ttl_dns_cache=300, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                 headers=self.headers, raise_for_status=True)
+        return self
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def fetch_error(self, e):
+        status = getattr(e, "status", None)
+        if isinstance(e, asyncio.TimeoutError):
+            self.errors["timeout"] += 1
+        elif status is not None:
+            self.errors[f"http_{status}"] += 1
+        elif isinstance(e, ValueError):
+            self.errors["invalid_body"] += 1
+        else:
+            self.errors["connection"] += 1
+        return FetchError(f"{type(e).__name__}: {e}", status)
+
+    async def get_text(self, url):
+        if self.session is None:
+            await self.start()
+        self.requests += 1
+        try:
+            async with self.session.get(url) as response:
+                return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise self.fetch_error(e) from e
+
+    async def get_json(self, url, params=None):
+        if self.session is None:
+            await self.start()
+        self.requests += 1
+        try:
+            async with self.session.get(url, params=params) as response:
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise self.fetch_error(e) from e
+
+    def stats(self):
+        return {"requests": self.requests, "errors": dict(self.errors)}
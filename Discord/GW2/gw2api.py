@@ -0,0 +1,189 @@
+# gw2api.py
+
+import asyncio
+import re
+from functools import partial
+
+from fetcher import FetchError
+
+API_BASE = "https://api.guildwars2.com"
+COLOR_TAG = re.compile(r"</?c(?:=[^>]*)?>|<br\s*/?>", re.IGNORECASE)
+CAMEL_CASE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+# API type names whose wiki label is not just the name split into words ("CraftingMaterial" -> "Crafting material").
+TYPE_LABELS = {
+    "LongBow": "Longbow",
+    "ShortBow": "Short bow",
+    "Speargun": "Harpoon gun",
+    "HelmAquatic": "Aquatic headgear",
+    "MiniPet": "Miniature",
+    "JadeTechModule": "Jade Bot module",
+}
+
+# Item flags that correspond to the wiki's "Binding" field.
+BINDING_FLAGS = {
+    "AccountBound": "Account Bound on Acquire",
+    "AccountBindOnUse": "Account Bound on Use",
+    "SoulbindOnAcquire": "Soulbound on Acquire",
+    "SoulBindOnUse": "Soulbound on Use",
+}
+
+
+class BatchLoader:
+    """Collects ids requested within `delay` seconds and loads them with one `ids=` request.
+
+    `load_batch` is a coroutine function taking a list of ids and returning a
+    dict of id -> entry. Ids the upstream does not know resolve to None.
+    """
+
+    def __init__(self, load_batch, batch_size=200, delay=0.01):
+        self.load_batch = load_batch
+        self.batch_size = batch_size
+        self.delay = delay
+        self.pending = {}
+        self.flush_handle = None
+        self.tasks = set()
+        self.requests = 0
+        self.loaded = 0
+
+    async def load(self, key):
+        loop = asyncio.get_running_loop()
+        future = self.pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self.pending[key] = future
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            elif self.flush_handle is None:
+                self.flush_handle = loop.call_later(self.delay, self.flush)
+        # A cancelled caller must not cancel the result for others waiting on the same id.
+        return await asyncio.shield(future)
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            task = asyncio.ensure_future(self.run_batch(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, batch):
+        self.requests += 1
+        self.loaded += len(batch)
+        try:
+            results = await self.load_batch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self):
+        return {"requests": self.requests, "ids": self.loaded,
+                "ids_per_request": self.loaded / self.requests if self.requests else 0.0}
+
+
+class GW2Api:
+    """Client for the official GW2 API, sharing the bot's Fetcher.
+
+    Item and price lookups that arrive close together are merged into batched
+    `ids=` requests. `base_url` can point at a local stub server for tests.
+    """
+
+    def __init__(self, fetcher, base_url=API_BASE, lang="en", batch_size=200, batch_delay=0.01):
+        self.fetcher = fetcher
+        self.base_url = base_url.rstrip("/")
+        self.lang = lang
+        self.items = BatchLoader(partial(self.fetch_by_ids, "/v2/items"), batch_size, batch_delay)
+        self.prices = BatchLoader(partial(self.fetch_by_ids, "/v2/commerce/prices"), batch_size, batch_delay)
+
+    async def get(self, path, **params):
+        return await self.fetcher.get_json(self.base_url + path, params={"lang": self.lang, **params})
+
+    async def fetch_by_ids(self, path, ids):
+        try:
+            entries = await self.get(path, ids=",".join(map(str, ids)))
+        except FetchError as e:
+            # The API answers 404 when none of the requested ids exist, e.g. untradeable items.
+            if e.status == 404:
+                return {}
+            raise
+        return {entry["id"]: entry for entry in entries}
+
+    async def get_item(self, item_id):
+        return await self.items.load(int(item_id))
+
+    async def get_price(self, item_id):
+        return await self.prices.load(int(item_id))
+
+    async def get_recipe(self, item_id):
+        """Return the first crafting recipe for an item as recipe_data, or {}.
+
+        Mystic Forge recipes are not part of the API; the bot falls back to
+        the recipes it has read from the wiki for those.
+        """
+        recipe_ids = await self.get("/v2/recipes/search", output=int(item_id))
+        if not recipe_ids:
+            return {}
+        recipes = await self.get("/v2/recipes", ids=recipe_ids[0])
+        if not recipes:
+            return {}
+        recipe = recipes[0]
+        ingredients = [ing for ing in recipe.get("ingredients", []) if ing.get("type", "Item") == "Item"]
+        items = await asyncio.gather(*(self.get_item(ing.get("id", ing.get("item_id"))) for ing in ingredients))
+        return {
+            "output_qty": str(recipe.get("output_item_count", 1)),
+            "ingredients_list": [f"{ing['count']} {item['name'] if item else ing.get('id', ing.get('item_id'))}"
+                                 for ing, item in zip(ingredients, items)],
+        }
+
+    async def iter_item_pages(self, page_size=200):
+        page = 0
+        while True:
+            try:
+                entries = await self.get("/v2/items", page=page, page_size=page_size)
+            except FetchError as e:
+                # Asking past the last page is answered with an error status.
+                if e.status in (400, 404):
+                    return
+                raise
+            yield entries
+            if len(entries) < page_size:
+                return
+            page += 1
+
+
+def type_label(name):
+    """The wiki's wording of an API type name, e.g. "UpgradeComponent" -> "Upgrade component"."""
+    if not name:
+        return None
+    return TYPE_LABELS.get(name) or CAMEL_CASE.sub(" ", name).capitalize()
+
+
+def item_to_data(item, wiki_url):
+    """Build the bot's item_data dict from a /v2/items entry."""
+    details = item.get("details") or {}
+    # Items without a subtype, such as most upgrade components, have a details type of "Default".
+    detail_type = details.get("type") if details.get("type") != "Default" else None
+    description = COLOR_TAG.sub("", item.get("description") or "").strip()
+    binding = next((BINDING_FLAGS[flag] for flag in item.get("flags", []) if flag in BINDING_FLAGS), None)
+    item_data = {
+        "wiki_url": wiki_url,
+        "name": item["name"],
+        "description": description or "No description available.",
+        "rarity": item.get("rarity"),
+        "type": type_label(detail_type or item.get("type")),
+        "req_level": str(item["level"]) if item.get("level") else None,
+        "binding": binding,
+        "api_id": str(item["id"]),
+        "source": "API",
+    }
+    if item.get("icon"):
+        item_data["icon_url"] = item["icon"]
+    return item_data
+
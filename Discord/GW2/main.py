@@ -1,8 +1,17 @@
 # main.py
 
+import os
+
 from bot import Bot
+from sharding import run_sharded
 
 if __name__ == "__main__":
+    shard_count = int(os.getenv('SHARD_COUNT', 1))
+    if shard_count > 1:
+        # Run one bot process per gateway shard instead
+        run_sharded(shard_count)
+        raise SystemExit
+
     # Create an instance of the bot
     bot = Bot()
 
@@ -13,4 +22,4 @@ if __name__ == "__main__":
     else:
         # Start the bot
         print("Starting GW2 Wiki Bot...")
-        bot.run(bot.TOKEN)
\ No newline at end of file
+        bot.run(bot.TOKEN, root_logger=True)
\ No newline at end of file
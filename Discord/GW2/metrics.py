@@ -0,0 +1,160 @@
+# metrics.py
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from aiohttp import web
+
+# Upper bounds in seconds; they cover everything from a cached hit to a slow wiki page.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation; coarse, but cheap and mergeable.
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return None
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            flatten(f"{prefix}_{key}", inner, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+class Metrics:
+    """Counters and histograms for the lookup pipeline.
+
+    Counters and histograms are keyed by name plus labels. Collectors are
+    functions returning a (possibly nested) dict of numbers, such as cache
+    statistics; they are read when metrics are exported and show up as
+    gauges. Export is available as Prometheus text or as JSON.
+    """
+
+    def __init__(self, namespace="gw2bot"):
+        self.namespace = namespace
+        self.started = time.time()
+        self.counters = Counter()
+        self.histograms = {}
+        self.collectors = {}
+
+    def inc(self, name, amount=1, **labels):
+        self.counters[name, tuple(sorted(labels.items()))] += amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def record(self, timer):
+        for stage, seconds in timer.stages.items():
+            self.observe("lookup_stage_seconds", seconds, stage=stage)
+
+    def add_collector(self, name, collect):
+        self.collectors[name] = collect
+
+    def gauges(self):
+        values = {}
+        for name, collect in self.collectors.items():
+            flatten(name, collect(), values)
+        return values
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "uptime_seconds": time.time() - self.started,
+            "counters": {f"{name}{label_text(labels)}": value for (name, labels), value in self.counters.items()},
+            "histograms": {
+                f"{name}{label_text(labels)}": {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                }
+                for (name, labels), histogram in self.histograms.items()
+            },
+            "gauges": self.gauges(),
+        }
+
+    def prometheus(self):
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"{self.namespace}_{name}{label_text(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            full_name = f"{self.namespace}_{name}"
+            for bound, total in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{full_name}_bucket{label_text((*labels, ('le', le)))} {total}")
+            lines.append(f"{full_name}_sum{label_text(labels)} {histogram.sum}")
+            lines.append(f"{full_name}_count{label_text(labels)} {histogram.count}")
+        for name, value in sorted(self.gauges().items()):
+            lines.append(f"{self.namespace}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(metrics, host="127.0.0.1", port=9108):
+    """Serve /metrics (Prometheus text) and /metrics.json. Returns the runner to clean up on shutdown."""
+
+    async def prometheus(request):
+        return web.Response(text=metrics.prometheus(), content_type="text/plain")
+
+    async def snapshot(request):
+        return web.json_response(metrics.snapshot())
+
+    app = web.Application()
+    app.router.add_get("/metrics", prometheus)
+    app.router.add_get("/metrics.json", snapshot)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def dump_periodically(metrics, path, interval=60):
+    """Rewrite `path` with a JSON snapshot every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metrics.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
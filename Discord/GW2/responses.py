@@ -2,5 +2,10 @@ responses = {
     "item_not_provided": "Please provide an item name to look up.",
     "wiki_connection_failed": "Sorry, I couldn't connect to the Guild Wars 2 Wiki right now.",
     "item_not_found_on_wiki": "Item `{item_name}` could not be found. Please check the spelling.",
+    "item_not_found_suggestions": "Item `{item_name}` could not be found. Did you mean {suggestions}?",
     "infobox_not_found": "Sorry, I couldn't find the item's data infobox on the page for `{item_name}`.",
+    "disambiguation_unresolved": "I found a disambiguation page for `{item_name}`, but couldn't determine the correct item page.",
+    "user_limited": "You're sending lookups faster than I can keep up with. Please wait a few seconds and try again.",
+    "guild_limited": "This server is sending a lot of lookups right now. Please try again in a moment.",
+    "queue_full": "I'm handling a lot of lookups right now. Please try again in a minute.",
 }
\ No newline at end of file
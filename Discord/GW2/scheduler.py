@@ -0,0 +1,149 @@
+# scheduler.py
+
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+
+from timings import percentile
+
+log = logging.getLogger(__name__)
+
+ACCEPTED = "accepted"
+USER_LIMITED = "user_limited"
+GUILD_LIMITED = "guild_limited"
+QUEUE_FULL = "queue_full"
+
+
+class TokenBucket:
+    """Allows `rate` actions per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class RateLimiter:
+    """One token bucket per key (user or guild id).
+
+    A `rate` of 0 disables the limit. Only the `max_keys` most recently seen
+    keys keep a bucket, so memory stays bounded however many users show up.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    def bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        self.buckets.move_to_end(key)
+        return bucket
+
+    def try_acquire(self, key):
+        if not self.rate or key is None:
+            return True
+        return self.bucket(key).try_acquire()
+
+    def refund(self, key):
+        if self.rate and key in self.buckets:
+            self.buckets[key].refund()
+
+
+class LookupScheduler:
+    """Bounded queue of pending lookups worked off by a fixed number of workers.
+
+    `workers` is the global cap on lookups running against the upstreams at
+    once. `submit` never waits: it either queues the job or says why it was
+    turned away, so the caller can answer right away.
+    """
+
+    def __init__(self, handler, workers=4, max_queue=100, user_rate=0.2, user_burst=3, guild_rate=2.0,
+                 guild_burst=20, wait_window=1000):
+        self.handler = handler
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.user_limits = RateLimiter(user_rate, user_burst)
+        self.guild_limits = RateLimiter(guild_rate, guild_burst)
+        self.worker_tasks = []
+        self.busy = 0
+        self.outcomes = Counter()
+        self.waits = deque(maxlen=wait_window)
+
+    def start(self):
+        if not self.worker_tasks:
+            self.worker_tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    def submit(self, user_id, guild_id, *job):
+        self.start()
+        if not self.user_limits.try_acquire(user_id):
+            outcome = USER_LIMITED
+        elif not self.guild_limits.try_acquire(guild_id):
+            self.user_limits.refund(user_id)
+            outcome = GUILD_LIMITED
+        else:
+            try:
+                self.queue.put_nowait((time.perf_counter(), job))
+                outcome = ACCEPTED
+            except asyncio.QueueFull:
+                # Turned away for load, not for the user's behaviour, so the tokens are given back.
+                self.user_limits.refund(user_id)
+                self.guild_limits.refund(guild_id)
+                outcome = QUEUE_FULL
+        self.outcomes[outcome] += 1
+        return outcome
+
+    async def work(self):
+        while True:
+            queued_at, job = await self.queue.get()
+            self.waits.append(time.perf_counter() - queued_at)
+            self.busy += 1
+            try:
+                await self.handler(*job)
+            except Exception:
+                log.exception("Lookup failed with an unexpected error")
+            finally:
+                self.busy -= 1
+                self.queue.task_done()
+
+    async def join(self):
+        await self.queue.join()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "busy_workers": self.busy,
+            "workers": self.workers,
+            **{outcome: self.outcomes[outcome] for outcome in (ACCEPTED, USER_LIMITED, GUILD_LIMITED, QUEUE_FULL)},
+            "wait_p50_ms": (percentile(self.waits, 50) or 0.0) * 1000,
+            "wait_p99_ms": (percentile(self.waits, 99) or 0.0) * 1000,
+        }
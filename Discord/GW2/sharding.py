@@ -0,0 +1,57 @@
+# sharding.py
+
+import multiprocessing
+import os
+import time
+
+
+def shard_for_guild(guild_id, shard_count):
+    """The shard Discord delivers a guild's events to. Direct messages always go to shard 0."""
+    if guild_id is None:
+        return 0
+    return (guild_id >> 22) % shard_count
+
+
+def run_shard(shard_id, shard_count):
+    from bot import Bot
+
+    bot = Bot(shard_id=shard_id, shard_count=shard_count)
+    print(f"Starting GW2 Wiki Bot shard {shard_id + 1}/{shard_count} (pid {os.getpid()})...")
+    bot.run(bot.TOKEN, root_logger=True)
+
+
+def run_sharded(shard_count, restart_delay=5):
+    """Run one bot process per gateway shard and restart any shard that exits.
+
+    The processes share the sqlite cache (CACHE_DB) and the item index file
+    (ITEM_INDEX), so an item one shard has cached is served from the cache
+    by the others. Concurrent lookups are only coalesced within a process:
+    shards that look up the same uncached item at the same time each fetch
+    and parse it.
+    """
+    if not os.getenv('DISCORD_TOKEN'):
+        print("Error: DISCORD_TOKEN not found in .env file.")
+        return
+    if not os.getenv('CACHE_DB'):
+        print("Warning: CACHE_DB is not set, so every shard keeps its own cache.")
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+    try:
+        while True:
+            for shard_id in range(shard_count):
+                process = processes.get(shard_id)
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    print(f"Shard {shard_id} exited with code {process.exitcode}, restarting.")
+                processes[shard_id] = context.Process(target=run_shard, args=(shard_id, shard_count),
+                                                      name=f"shard-{shard_id}")
+                processes[shard_id].start()
+            time.sleep(restart_delay)
+    except KeyboardInterrupt:
+        print("Stopping shards...")
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
@@ -0,0 +1,58 @@
+# timings.py
+
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Collects how long each stage of a single lookup took, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def mark(self, name):
+        # Records the time elapsed since the lookup started, e.g. when the first reply went out.
+        self.stages[name] = time.perf_counter() - self.started
+
+    def __str__(self):
+        return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.stages.items())
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyStats:
+    """Keeps the most recent samples per stage so p50/p99 can be reported."""
+
+    def __init__(self, window=1000):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, timer):
+        for name, seconds in timer.stages.items():
+            self.samples[name].append(seconds)
+
+    def summary(self):
+        return {name: {"count": len(samples),
+                       "p50_ms": percentile(samples, 50) * 1000,
+                       "p99_ms": percentile(samples, 99) * 1000}
+                for name, samples in self.samples.items() if samples}
+
+    def report(self):
+        lines = [f"{name:>16}: n={stats['count']:<5} p50={stats['p50_ms']:8.1f}ms  p99={stats['p99_ms']:8.1f}ms"
+                 for name, stats in self.summary().items()]
+        return "\n".join(lines)
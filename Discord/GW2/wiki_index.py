@@ -0,0 +1,295 @@
+# wiki_index.py
+
+import asyncio
+import mmap
+import os
+import re
+import struct
+import zlib
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import NamedTuple
+
+# File layout, all integers little-endian uint32:
+#   header       magic, entry count, trigram count
+#   offsets      entry count + 1 record offsets into the blob
+#   trigrams     (trigram hash, first posting, posting count) sorted by hash
+#   postings     entry numbers, grouped per trigram
+#   blob         "key\x1ftitle\x1fapi_id" records sorted by key
+# Everything is read straight from the mapped file, so opening it costs no parsing.
+MAGIC = b"GW2WIDX1"
+HEADER = struct.Struct("<8sII")
+TRIGRAM = struct.Struct("<III")
+SEPARATOR = "\x1f"
+DIGITS = re.compile(r"\d+")
+
+
+def normalize_name(name):
+    return re.sub(r"[\s_]+", " ", name).strip().lower()
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_hash(gram):
+    return zlib.crc32(gram.encode("utf-8"))
+
+
+class IndexEntry(NamedTuple):
+    key: str
+    title: str
+    api_id: int = None
+
+
+def write_index(path, entries):
+    """Write (name, title, api_id) entries to `path`. The first entry for a name wins."""
+    records = {}
+    for name, title, api_id in entries:
+        key = normalize_name(name)
+        if key and key not in records:
+            records[key] = (title.replace(" ", "_"), api_id)
+    keys = sorted(records, key=lambda k: k.encode("utf-8"))
+
+    blob = bytearray()
+    offsets = []
+    postings_by_hash = {}
+    for number, key in enumerate(keys):
+        title, api_id = records[key]
+        offsets.append(len(blob))
+        blob += SEPARATOR.join((key, title, "" if api_id is None else str(api_id))).encode("utf-8")
+        for gram in trigrams(key):
+            postings_by_hash.setdefault(trigram_hash(gram), []).append(number)
+    offsets.append(len(blob))
+
+    table = bytearray()
+    postings = []
+    for gram_hash in sorted(postings_by_hash):
+        numbers = postings_by_hash[gram_hash]
+        table += TRIGRAM.pack(gram_hash, len(postings), len(numbers))
+        postings.extend(numbers)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(keys), len(postings_by_hash)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(table)
+        f.write(struct.pack(f"<{len(postings)}I", *postings))
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+class WikiIndex:
+    """Memory-mapped index of item names -> canonical wiki titles and API ids.
+
+    Names learned at runtime (for example where a disambiguation page led) are
+    kept in memory on top of the file and written into it by `rebuild`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.learned = {}
+        self.map = None
+        self.count = 0
+        self.trigram_count = 0
+        self.file_id = None
+        if path and os.path.exists(path):
+            self.open()
+
+    def open(self):
+        self.close()
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.file_id = (stat.st_ino, stat.st_mtime_ns)
+            if stat.st_size < HEADER.size:
+                return
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.trigram_count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a wiki index file")
+        self.offsets_at = HEADER.size
+        self.trigrams_at = self.offsets_at + (self.count + 1) * 4
+        self.postings_at = self.trigrams_at + self.trigram_count * TRIGRAM.size
+        posting_total = 0
+        if self.trigram_count:
+            _, first, length = TRIGRAM.unpack_from(self.map, self.postings_at - TRIGRAM.size)
+            posting_total = first + length
+        self.blob_at = self.postings_at + posting_total * 4
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.map = None
+        self.count = 0
+        self.trigram_count = 0
+
+    def reload_if_changed(self):
+        """Map the file again if another process replaced it. Returns True when it did."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        stat = os.stat(self.path)
+        if (stat.st_ino, stat.st_mtime_ns) == self.file_id:
+            return False
+        self.open()
+        return True
+
+    def __len__(self):
+        return self.count + len(self.learned)
+
+    def record(self, number):
+        start, end = struct.unpack_from("<II", self.map, self.offsets_at + number * 4)
+        return self.map[self.blob_at + start:self.blob_at + end]
+
+    def entry(self, number):
+        key, title, api_id = self.record(number).decode("utf-8").split(SEPARATOR)
+        return IndexEntry(key, title, int(api_id) if api_id else None)
+
+    def key_bytes(self, number):
+        record = self.record(number)
+        return record[:record.index(SEPARATOR.encode())]
+
+    def lower_bound(self, key):
+        # bisect over entry numbers, comparing the keys stored in the map.
+        keys = _KeyView(self)
+        return bisect_left(keys, key.encode("utf-8"))
+
+    def get(self, name):
+        key = normalize_name(name)
+        if key in self.learned:
+            return self.learned[key]
+        if self.map is None:
+            return None
+        number = self.lower_bound(key)
+        if number < self.count and self.key_bytes(number) == key.encode("utf-8"):
+            return self.entry(number)
+        return None
+
+    def prefix(self, text, limit=10):
+        """Entries whose name starts with `text`, in name order."""
+        key = normalize_name(text)
+        found = {}
+        if self.map is not None:
+            encoded = key.encode("utf-8")
+            number = self.lower_bound(key)
+            while number < self.count and len(found) < limit and self.key_bytes(number).startswith(encoded):
+                entry = self.entry(number)
+                found[entry.key] = entry
+                number += 1
+        found.update((k, entry) for k, entry in self.learned.items() if k.startswith(key))
+        return [found[k] for k in sorted(found)[:limit]]
+
+    def postings(self, gram):
+        gram_hash = trigram_hash(gram)
+        low, high = 0, self.trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            if TRIGRAM.unpack_from(self.map, self.trigrams_at + middle * TRIGRAM.size)[0] < gram_hash:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.trigram_count:
+            return ()
+        found_hash, first, length = TRIGRAM.unpack_from(self.map, self.trigrams_at + low * TRIGRAM.size)
+        if found_hash != gram_hash:
+            return ()
+        return struct.unpack_from(f"<{length}I", self.map, self.postings_at + first * 4)
+
+    def fuzzy(self, text, limit=5, candidates=50):
+        """Best (score, entry) matches for a misspelled name, best first.
+
+        Entries sharing the most trigrams with `text` are scored with
+        difflib's ratio. Trigrams found in more than 10% of all names say
+        little about the match, so they are skipped unless nothing else is left.
+        """
+        key = normalize_name(text)
+        if not key:
+            return []
+        shared = Counter()
+        if self.map is not None:
+            lists = sorted((self.postings(gram) for gram in trigrams(key)), key=len)
+            common = max(1000, self.count // 10)
+            selective = [numbers for numbers in lists if len(numbers) <= common] or lists[:1]
+            for numbers in selective:
+                shared.update(numbers)
+        pool = {}
+        for number, _ in shared.most_common(candidates):
+            entry = self.entry(number)
+            pool[entry.key] = entry
+        pool.update(self.learned)
+        scored = [(SequenceMatcher(None, key, k).ratio(), entry) for k, entry in pool.items()]
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return scored[:limit]
+
+    def resolve(self, name, min_score=0.85):
+        """Exact match, else the best fuzzy match scoring at least `min_score`.
+
+        A fuzzy match must contain the same numbers as `name`: "Item 12" and
+        "Item 13" are one edit apart but are different items, and the index
+        may simply not know the one that was asked for.
+        """
+        entry = self.get(name)
+        if entry is not None:
+            return entry
+        numbers = DIGITS.findall(normalize_name(name))
+        for score, entry in self.fuzzy(name, limit=3):
+            if score >= min_score and DIGITS.findall(entry.key) == numbers:
+                return entry
+        return None
+
+    def learn(self, name, title, api_id=None):
+        key = normalize_name(name)
+        entry = IndexEntry(key, title.replace(" ", "_"), int(api_id) if api_id else None)
+        if self.learned.get(key) != entry and self.get(name) != entry:
+            self.learned[key] = entry
+
+    def build(self, build_path, learned, extra_entries=()):
+        """Write `learned`, the mapped entries and `extra_entries` to `build_path`.
+
+        Only reads the index, so it can run in a worker thread while lookups go on.
+        """
+        mapped = (self.entry(number) for number in range(self.count))
+        return write_index(build_path, [*learned.values(), *mapped, *extra_entries])
+
+    def swap_in(self, build_path, learned):
+        self.close()
+        os.replace(build_path, self.path)
+        # Names learned while the file was being built are kept for the next rebuild.
+        for key, entry in learned.items():
+            if self.learned.get(key) == entry:
+                del self.learned[key]
+        self.open()
+
+    async def refresh(self, extra_entries=()):
+        """Rebuild the file with learned names and `extra_entries` (name, title, api_id) without blocking lookups."""
+        if not self.path:
+            return len(self)
+        learned = dict(self.learned)
+        # Shard processes share the file, so each builds under its own name and swaps it in atomically.
+        build_path = f"{self.path}.{os.getpid()}.build"
+        await asyncio.to_thread(self.build, build_path, learned, extra_entries)
+        self.swap_in(build_path, learned)
+        return self.count
+
+    def save(self):
+        if self.path and self.learned:
+            learned = dict(self.learned)
+            build_path = f"{self.path}.{os.getpid()}.build"
+            self.build(build_path, learned)
+            self.swap_in(build_path, learned)
+
+
+class _KeyView:
+    """Sequence of the mapped keys as bytes, so bisect can search them in place."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, number):
+        return self.index.key_bytes(number)
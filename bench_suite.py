@@ -0,0 +1,183 @@
+# bench_suite.py
+#
+# Runs the benchmark suites of the projects in this repository (the cases in
+# each project's benchmarks/suite.py), appends the results to
+# .benchmarks/history.jsonl and compares them with the last passing run on
+# this machine. Exits with status 1 when a case got slower than --tolerance
+# allows, so it can guard performance work like a CI check. Run from the
+# repository root:
+#
+#     python bench_suite.py                        # every project
+#     python bench_suite.py --project gw2 --quick --no-save
+#     python bench_suite.py --baseline 1a2b3c4     # compare with the run recorded at that commit
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PROJECTS = {'aqi': 'AQI data exploration exercise', 'gw2': os.path.join('Discord', 'GW2')}
+HISTORY = os.path.join(ROOT, '.benchmarks', 'history.jsonl')
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:7.2f} {unit}'
+    return f'{seconds / 1e-9:7.0f} ns'
+
+
+def time_case(function, repeat, min_time):
+    """Seconds per call over `repeat` samples, each of enough calls to take at least `min_time`.
+
+    The first call is a warm-up and sets the number of calls per sample.
+    The garbage collector is off while a sample runs, as in timeit.
+    """
+    start = time.perf_counter()
+    function()
+    once = time.perf_counter() - start
+    number = max(1, int(min_time / once)) if once > 0 else 1000
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            samples.append((time.perf_counter() - start) / number)
+        finally:
+            gc.enable()
+    return {'min': min(samples), 'median': statistics.median(samples), 'number': number, 'repeat': repeat}
+
+
+def run_project(project, output, quick, pattern, repeat, min_time):
+    """Time one project's cases, from inside its directory as its own benchmarks are run."""
+    directory = os.path.join(ROOT, PROJECTS[project])
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    suite = importlib.import_module('benchmarks.suite')
+    results = {}
+    with tempfile.TemporaryDirectory(prefix=f'bench_{project}_') as workdir:
+        print(f'{project}: preparing cases...', flush=True)
+        for name, function in suite.cases(workdir, quick).items():
+            name = f'{project}.{name}'
+            if pattern and not re.search(pattern, name):
+                continue
+            results[name] = time_case(function, repeat, min_time)
+            print(f'  {name:45} {format_seconds(results[name]["min"])}', flush=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history():
+    if not os.path.exists(HISTORY):
+        return []
+    with open(HISTORY, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(history, machine, quick, commit=None):
+    """The latest run on this machine with the same data sizes: at `commit`, or else the latest one that passed."""
+    runs = [run for run in history if run['machine'] == machine and run['quick'] == quick]
+    if commit:
+        runs = [run for run in runs if (run['commit'] or '').startswith(commit)]
+    else:
+        runs = [run for run in runs if not run['regressions']]
+    return runs[-1] if runs else None
+
+
+def compare(results, baseline, tolerance):
+    """Print every case against the baseline; returns the names of the ones slower than `tolerance` allows."""
+    regressions = []
+    print(f"\n{'case':45} {'baseline':>10} {'now':>10}  change")
+    for name, result in results.items():
+        before = baseline['results'].get(name) if baseline else None
+        if before is None:
+            print(f"{name:45} {'-':>10} {format_seconds(result['min'])}  new")
+            continue
+        ratio = result['min'] / before['min']
+        verdict = 'SLOWER' if ratio > 1 + tolerance else 'faster' if ratio < 1 / (1 + tolerance) else ''
+        if verdict == 'SLOWER':
+            regressions.append(name)
+        print(f"{name:45} {format_seconds(before['min'])} {format_seconds(result['min'])}  "
+              f"{ratio - 1:+6.0%} {verdict}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suites and compare them with earlier runs.")
+    parser.add_argument('--project', nargs='+', choices=sorted(PROJECTS), default=sorted(PROJECTS))
+    parser.add_argument('--filter', metavar='REGEX', help="only run cases whose name matches")
+    parser.add_argument('--quick', action='store_true', help="smaller synthetic data; compared only with quick runs")
+    parser.add_argument('--repeat', type=int, default=5, help="timed samples per case; the fastest one counts")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds each sample runs for at least")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="how much slower than the baseline a case may get before the run fails")
+    parser.add_argument('--baseline', metavar='COMMIT',
+                        help="compare with the run recorded at this commit instead of the last passing run")
+    parser.add_argument('--no-save', action='store_true', help="do not record this run in the history")
+    parser.add_argument('--worker', choices=sorted(PROJECTS), help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_project(args.worker, args.output, args.quick, args.filter, args.repeat, args.min_time)
+        return 0
+
+    # Each project runs in its own process: both have a benchmarks package, and imports and memory stay separate.
+    results = {}
+    for project in args.project:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            command = [sys.executable, os.path.abspath(__file__), '--worker', project, '--output', output,
+                       '--repeat', str(args.repeat), '--min-time', str(args.min_time)]
+            command += ['--quick'] if args.quick else []
+            command += ['--filter', args.filter] if args.filter else []
+            if subprocess.run(command).returncode != 0:
+                print(f"The {project} suite failed.")
+                return 2
+            with open(output, encoding='utf-8') as f:
+                results.update(json.load(f))
+
+    machine = f'{platform.node()} {platform.machine()} {os.cpu_count()} cpu python {platform.python_version()}'
+    baseline = find_baseline(load_history(), machine, args.quick, args.baseline)
+    if baseline:
+        print(f"\nBaseline: run of {baseline['time']} at {baseline['commit']}")
+    else:
+        print("\nNo earlier run on this machine to compare with.")
+    regressions = compare(results, baseline, args.tolerance)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+        run = {'time': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(), 'machine': machine,
+               'quick': args.quick, 'results': results, 'regressions': regressions}
+        with open(HISTORY, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run) + '\n')
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) got more than {args.tolerance:.0%} slower: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())